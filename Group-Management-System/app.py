@@ -1,23 +1,46 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, make_response
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, make_response, Response, stream_with_context, has_app_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, date, timedelta
+from datetime import datetime, date, timedelta, timezone
 import os
-import json
 import csv
+import json
 import io
-import random
 import hashlib
 import secrets
 import re
 from functools import wraps
+from rate_limiter import create_rate_limiter
+from ip_blocklist import IPBlocklist, normalize_network
+from audit_writer import AuditLogWriter
+from migrations import upgrade as upgrade_schema
+from export_formats import COLUMNAR_FORMATS, columnar_available, columnar_chunks, gzip_chunks
+from auto_login import AutoLoginTokens, load_or_create_secret
+from user_cache import CachedUser, UserCache
+from request_scanner import RequestScanner
+from task_stats import adjust_daily_stat, rebuild_daily_stats
+from event_bus import create_event_bus
+import task_search
+from audit_archive import AuditArchive
+from password_hashing import PasswordHasher, PasswordHasherBusy
+from storage import (RoutingSession, backend_name, configure_engines, in_write_transaction, normalize_database_url,
+                     setup_engines)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = secrets.token_hex(32)  # 使用随机生成的密钥
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///workflow.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = normalize_database_url(os.environ.get('DATABASE_URL', 'sqlite:///workflow.db'))
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# 数据库连接配置（见 storage.py）
+app.config['DATABASE_POOL_SIZE'] = int(os.environ.get('DATABASE_POOL_SIZE', 10))  # 数据库服务器：每个进程的连接池大小
+app.config['DATABASE_MAX_OVERFLOW'] = int(os.environ.get('DATABASE_MAX_OVERFLOW', 10))  # 数据库服务器：连接池繁忙时可额外创建的连接数
+app.config['DATABASE_POOL_RECYCLE'] = int(os.environ.get('DATABASE_POOL_RECYCLE', 1800))  # 数据库服务器：连接使用多久后重建（秒）
+app.config['DATABASE_POOL_TIMEOUT'] = 30  # 等待空闲连接的最长时间（秒）
+app.config['DATABASE_READ_SPLIT'] = os.environ.get('DATABASE_READ_SPLIT', '1') != '0'  # SQLite：读语句使用独立的只读连接池
+app.config['DATABASE_READ_POOL_SIZE'] = 8  # SQLite：只读连接池大小
+app.config['DATABASE_READ_MAX_OVERFLOW'] = 8  # SQLite：只读连接池繁忙时可额外创建的连接数
+app.config['SQLITE_PRAGMAS'] = {}  # 覆盖默认的 SQLite 连接参数，如 {'cache_size': -64000}
+
 # 安全配置
 app.config['SESSION_COOKIE_SECURE'] = False  # 开发环境设为False，生产环境设为True
 app.config['SESSION_COOKIE_HTTPONLY'] = True
@@ -26,22 +49,92 @@ app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=24)
 
 # 自动登录和安全配置
 app.config['AUTO_LOGIN_ENABLED'] = True  # 启用自动登录
+app.config['AUTO_LOGIN_MAX_AGE'] = 30 * 24 * 60 * 60  # 自动登录令牌有效期（秒）
+app.config['AUTO_LOGIN_CACHE_TTL'] = 300  # 已验证令牌的缓存时间（秒）
+app.config['AUTO_LOGIN_REVOCATION_REFRESH'] = 30  # 已注销令牌列表的刷新间隔（秒），其他 worker 进程最迟在此时间后拒绝已注销的令牌
+app.config['AUTO_LOGIN_SECRET'] = os.environ.get('AUTO_LOGIN_SECRET')  # 令牌签名密钥，未设置时保存在 instance 目录
 app.config['TRUSTED_IPS'] = ['127.0.0.1', '::1', 'localhost']  # 受信任的IP地址
 app.config['MAX_LOGIN_ATTEMPTS'] = 5  # 最大登录尝试次数
 app.config['LOCKOUT_DURATION'] = 30  # 锁定时间（分钟）
-app.config['RATE_LIMIT_WINDOW'] = 300  # 速率限制窗口（秒）
-app.config['MAX_REQUESTS_PER_WINDOW'] = 100  # 每个窗口最大请求数
+app.config['USER_CACHE_TTL'] = 60  # 登录用户身份缓存时间（秒）
+
+# 密码哈希配置（校验在进程池中执行，旧哈希在登录成功后按当前配置升级）
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')  # werkzeug 写法，如 pbkdf2:sha256:600000、scrypt:32768:8:1
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))  # 进程池大小，0 表示在请求线程中计算
+app.config['PASSWORD_HASH_MAX_PENDING'] = 64  # 同时排队和计算的哈希任务上限，超过时登录直接返回繁忙
+app.config['PASSWORD_HASH_TIMEOUT'] = 10  # 等待哈希结果的最长时间（秒）
+app.config['RATE_LIMIT_WINDOW'] = 60  # 速率限制窗口（秒）
+app.config['MAX_REQUESTS_PER_WINDOW'] = 600  # 每个窗口最大请求数（每个请求都计数；已登录用户按用户统计，未登录按IP统计）
+app.config['RATE_LIMIT_BACKEND'] = os.environ.get('RATE_LIMIT_BACKEND', 'memory')  # memory 或 sqlite（多worker共享）
+app.config['RATE_LIMIT_SQLITE_PATH'] = os.path.join(app.instance_path, 'rate_limit.db')  # sqlite后端的共享文件
+app.config['IP_BLOCKLIST_REFRESH'] = 60  # IP黑名单内存副本的刷新间隔（秒）
+
+# 可疑请求特征（请求路径、查询字符串和请求体中出现时记录安全事件）
+app.config['SUSPICIOUS_PATTERNS'] = [
+    'sqlmap', 'nikto', 'nmap', 'dirb', 'gobuster', 'wfuzz',  # 安全扫描工具
+    'union select', 'drop table', 'insert into', 'delete from',  # SQL注入
+    '<script', 'javascript:', 'onload=', 'onerror=',  # XSS攻击
+    '../', '..\\', 'etc/passwd', 'windows/system32'  # 路径遍历
+]
+app.config['SCAN_MAX_BODY_BYTES'] = 64 * 1024  # 请求体最多扫描的字节数
+
+# 审计日志写入配置
+app.config['AUDIT_ASYNC'] = True  # 后台线程批量写入日志和安全事件
+app.config['AUDIT_FLUSH_INTERVAL'] = 1.0  # 批量写入间隔（秒）
+app.config['AUDIT_BATCH_SIZE'] = 500  # 每批最多写入行数
+app.config['AUDIT_QUEUE_SIZE'] = 10000  # 队列容量
+app.config['AUDIT_QUEUE_POLICY'] = 'block'  # 队列满时：block（短暂等待后丢弃）或 drop（立即丢弃）
+app.config['TASKS_MAX_PAGE_SIZE'] = 1000  # /api/tasks 单页最大任务数
+app.config['TASK_BATCH_MAX'] = 200  # /api/tasks/batch 单次最多操作数
+app.config['TASK_SEARCH_MAX_PAGE_SIZE'] = 100  # /api/tasks/search 单页最大结果数
+app.config['USERS_MAX_PAGE_SIZE'] = 500  # /api/users 单页最大用户数
+app.config['AUDIT_MAX_PAGE_SIZE'] = 200  # /api/logs、/api/security-events 单页最大条数
+app.config['AUDIT_APPROX_COUNT_LIMIT'] = 10000  # 有筛选条件时估算总数最多计数的条数
 
-db = SQLAlchemy(app)
+# 审计日志保留与归档配置（python audit_archive.py 执行归档）
+app.config['AUDIT_RETENTION_DAYS'] = {'log': 90, 'security_event': 180}  # 在线表保留天数，超过的按月归档
+app.config['AUDIT_ARCHIVE_DIR'] = os.path.join(app.instance_path, 'archive')  # 归档文件目录
+app.config['AUDIT_ARCHIVE_BATCH_SIZE'] = 5000  # 归档时每批读取和删除的记录数
+app.config['TASK_CHANGES_RETAIN'] = 50000  # 任务变更日志保留的最近记录数
+app.config['TASK_CHANGES_MAX'] = 1000  # 单次增量同步最多返回的变更数，超过时客户端需全量重新加载
+app.config['EXPORT_FETCH_SIZE'] = 1000  # 导出时每次从数据库游标读取的行数
+app.config['EXPORT_CHUNK_BYTES'] = 64 * 1024  # 导出时每次向客户端输出的数据块大小
+app.config['EXPORT_COLUMNAR_BATCH_ROWS'] = 10000  # 列式导出每批（Parquet row group）的行数
+
+# 实时推送（SSE）配置
+app.config['EVENT_BUS_BACKEND'] = os.environ.get('EVENT_BUS_BACKEND', 'memory')  # memory 或 sqlite（多worker共享）
+app.config['EVENT_BUS_SQLITE_PATH'] = os.path.join(app.instance_path, 'event_bus.db')  # sqlite后端的共享文件
+app.config['EVENT_BUS_POLL_INTERVAL'] = 0.5  # sqlite后端轮询新事件的间隔（秒）
+app.config['SSE_HEARTBEAT'] = 15  # SSE 连接心跳间隔（秒）
+app.config['SSE_QUEUE_SIZE'] = 1000  # 每条 SSE 连接缓存的待推送事件数
+
+configure_engines(app.config)
+DATABASE_BACKEND = backend_name(app.config['SQLALCHEMY_DATABASE_URI'])
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+with app.app_context():
+    setup_engines(db, app)
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
+rate_limiter = create_rate_limiter(app.config)
+event_bus = create_event_bus(app.config)
+audit_archive = AuditArchive(app.config['AUDIT_ARCHIVE_DIR'], batch_size=app.config['AUDIT_ARCHIVE_BATCH_SIZE'])
+password_hasher = PasswordHasher(
+    app.config['PASSWORD_HASH_METHOD'],
+    workers=app.config['PASSWORD_HASH_WORKERS'],
+    max_pending=app.config['PASSWORD_HASH_MAX_PENDING'],
+    timeout=app.config['PASSWORD_HASH_TIMEOUT']
+)
+request_scanner = RequestScanner(app.config['SUSPICIOUS_PATTERNS'], max_body_bytes=app.config['SCAN_MAX_BODY_BYTES'])
 
 # 用户模型（简化版）
 class User(UserMixin, db.Model):
+    __table_args__ = (
+        db.Index('ix_user_role_name', 'role', 'name', 'id'),  # 用户列表按角色筛选、按姓名排序分页
+    )
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
-    password_hash = db.Column(db.String(120), nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(20), default='employee')  # 'employee' or 'manager'
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), unique=True)  # 邮箱
@@ -65,6 +158,43 @@ class Task(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_task_user_id_date', 'user_id', 'date'),  # 职员查看自己的任务
+        db.Index('ix_task_date', 'date'),  # 领导按日期范围查看、导出
+    )
+
+# 任务日统计汇总模型（按用户、日期统计各优先级任务数）
+class TaskDailyStat(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    high_count = db.Column(db.Integer, nullable=False, default=0)
+    medium_count = db.Column(db.Integer, nullable=False, default=0)
+    low_count = db.Column(db.Integer, nullable=False, default=0)
+    total_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'date', name='uq_task_daily_stat_user_id_date'),
+        db.Index('ix_task_daily_stat_date', 'date'),
+    )
+
+# 任务月份版本模型（该月任务有任何变化时版本号加一，用于日历接口的ETag）
+class TaskMonthVersion(db.Model):
+    month = db.Column(db.String(7), primary_key=True)  # YYYY-MM
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+# 任务变更日志模型（自增ID即版本号，删除的任务保留一条 delete 记录）
+class TaskChange(db.Model):
+    __table_args__ = (
+        db.Index('ix_task_change_user_id_id', 'user_id', 'id'),
+        {'sqlite_autoincrement': True},
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    action = db.Column(db.String(10), nullable=False)  # upsert 或 delete
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 # 日志模型
 class Log(db.Model):
@@ -78,6 +208,12 @@ class Log(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     user = db.relationship('User', backref='logs')
+    
+    __table_args__ = (
+        db.Index('ix_log_created_at', 'created_at'),
+        db.Index('ix_log_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_log_action_created_at', 'action', 'created_at'),
+    )
 
 # 设备信任模型
 class TrustedDevice(db.Model):
@@ -91,6 +227,10 @@ class TrustedDevice(db.Model):
     is_active = db.Column(db.Boolean, default=True)  # 是否激活
     
     user = db.relationship('User', backref='trusted_devices')
+    
+    __table_args__ = (
+        db.Index('ix_trusted_device_user_device_ip', 'user_id', 'device_hash', 'ip_address'),
+    )
 
 # 安全事件模型
 class SecurityEvent(db.Model):
@@ -100,7 +240,36 @@ class SecurityEvent(db.Model):
     event_details = db.Column(db.Text)  # 事件详情
     user_agent = db.Column(db.String(500))  # 用户代理
     created_at = db.Column(db.DateTime, default=datetime.utcnow)  # 创建时间
-    is_blocked = db.Column(db.Boolean, default=False)  # 是否被阻止
+    is_blocked = db.Column(db.Boolean, default=False)  # 是否被阻止（旧版字段，现由 BlockedIP 管理）
+    
+    __table_args__ = (
+        db.Index('ix_security_event_created_at', 'created_at'),
+        db.Index('ix_security_event_ip_address_created_at', 'ip_address', 'created_at'),
+        db.Index('ix_security_event_event_type_created_at', 'event_type', 'created_at'),
+    )
+
+# IP黑名单模型
+class BlockedIP(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    ip_address = db.Column(db.String(49), unique=True, nullable=False)  # IP地址或CIDR网段
+    reason = db.Column(db.Text)  # 阻止原因
+    blocked_by = db.Column(db.Integer, db.ForeignKey('user.id'))  # 操作的管理员
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)  # 创建时间
+
+# 已注销的自动登录令牌（登出时写入，各 worker 进程定期读取）
+class RevokedToken(db.Model):
+    token_hash = db.Column(db.String(64), primary_key=True)  # 令牌的 SHA-256
+    expires_at = db.Column(db.DateTime, nullable=False)  # 令牌本身的过期时间，之后可删除
+    
+    __table_args__ = (
+        db.Index('ix_revoked_token_expires_at', 'expires_at'),
+    )
+
+def load_blocked_ips():
+    """读取黑名单中的所有地址/网段"""
+    return [ip_address for (ip_address,) in db.session.query(BlockedIP.ip_address)]
+
+ip_blocklist = IPBlocklist(load_blocked_ips, app.config['IP_BLOCKLIST_REFRESH'])
 
 # 安全工具函数
 def sanitize_input(text):
@@ -137,24 +306,51 @@ def rate_limit_check(user_id):
     if user.login_attempts >= 5:
         user.locked_until = datetime.utcnow() + timedelta(minutes=30)
         db.session.commit()
+        invalidate_user_caches(user.id)
         return False
     
     return True
 
-def log_action(action, details=None, ip_address=None):
-    """记录用户操作日志"""
+def write_audit_batch(table, rows):
+    """在一个事务中批量写入审计日志（executemany）"""
+    if has_app_context() and in_write_transaction(db.session()):
+        # 同步写入且当前请求的事务已占用写连接（SQLite 只有一个），随当前事务一起提交
+        db.session.execute(table.insert(), rows)
+        return
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(table.insert(), rows)
+
+audit_writer = AuditLogWriter(
+    write_audit_batch,
+    flush_interval=app.config['AUDIT_FLUSH_INTERVAL'],
+    batch_size=app.config['AUDIT_BATCH_SIZE'],
+    queue_size=app.config['AUDIT_QUEUE_SIZE'],
+    policy=app.config['AUDIT_QUEUE_POLICY'],
+    enabled=app.config['AUDIT_ASYNC']
+)
+
+def log_action(action, details=None, ip_address=None, user=None):
+    """记录用户操作日志（交给后台线程批量写入）
+
+    user 为操作涉及的用户，默认为当前登录用户。log.user_id 不能为空，
+    既未登录又没有指定用户的操作不写入操作日志（这类请求由安全事件记录）。
+    """
+    if user is None and current_user.is_authenticated:
+        user = current_user
+    if user is None:
+        return
     try:
         user_agent = request.headers.get('User-Agent', '')
-        log = Log(
-            user_id=current_user.id if current_user.is_authenticated else None,
-            user_name=current_user.name if current_user.is_authenticated else 'Anonymous',
-            action=action,
-            details=sanitize_input(details) if details else None,
-            ip_address=ip_address or request.remote_addr,
-            user_agent=user_agent[:500]  # 限制长度
-        )
-        db.session.add(log)
-        db.session.commit()
+        audit_writer.submit(Log.__table__, {
+            'user_id': user.id,
+            'user_name': user.name,
+            'action': action,
+            'details': sanitize_input(details) if details else None,
+            'ip_address': ip_address or request.remote_addr,
+            'user_agent': user_agent[:500],  # 限制长度
+            'created_at': datetime.utcnow()
+        })
     except Exception as e:
         print(f"日志记录失败: {e}")
 
@@ -205,48 +401,117 @@ def add_trusted_device(user_id, ip_address, user_agent):
         db.session.commit()
 
 def log_security_event(event_type, event_details, ip_address=None, user_agent=None):
-    """记录安全事件"""
+    """记录安全事件（交给后台线程批量写入），同时推送给在线的领导"""
     try:
-        security_event = SecurityEvent(
-            event_type=event_type,
-            event_details=sanitize_input(event_details),
-            ip_address=ip_address or request.remote_addr,
-            user_agent=user_agent or request.headers.get('User-Agent', '')[:500]
-        )
-        db.session.add(security_event)
-        db.session.commit()
+        row = {
+            'event_type': event_type,
+            'event_details': sanitize_input(event_details),
+            'ip_address': ip_address or request.remote_addr,
+            'user_agent': (user_agent or request.headers.get('User-Agent', ''))[:500],
+            'created_at': datetime.utcnow(),
+            'is_blocked': False
+        }
+        audit_writer.submit(SecurityEvent.__table__, row)
     except Exception as e:
         print(f"安全事件记录失败: {e}")
-
-def check_rate_limit(ip_address):
-    """检查速率限制"""
-    window_start = datetime.utcnow() - timedelta(seconds=app.config['RATE_LIMIT_WINDOW'])
-    
-    # 统计最近时间窗口内的请求数
-    recent_events = SecurityEvent.query.filter(
-        SecurityEvent.ip_address == ip_address,
-        SecurityEvent.created_at >= window_start
-    ).count()
+        return
     
-    if recent_events >= app.config['MAX_REQUESTS_PER_WINDOW']:
-        log_security_event('RATE_LIMIT_EXCEEDED', f'IP {ip_address} 请求频率过高', ip_address)
+    try:
+        event_bus.publish('security', {
+            'event_type': row['event_type'],
+            'event_details': row['event_details'],
+            'ip_address': row['ip_address'],
+            'created_at': row['created_at'].isoformat()
+        })
+    except Exception as e:
+        print(f"安全事件推送失败: {e}")
+
+def check_rate_limit(ip_address, user_id=None, user_agent=None):
+    """检查速率限制（统计滑动窗口内的实际请求数，不查询数据库）
+
+    已登录用户按用户ID计数，同一出口IP（如公司NAT）后的多个用户互不影响；未登录请求按IP计数。
+    """
+    key = f'user:{user_id}' if user_id is not None else f'ip:{ip_address}'
+    if not rate_limiter.hit(key):
+        if user_id is not None:
+            details = f'用户 {user_id}（IP {ip_address}）请求频率过高'
+        else:
+            details = f'IP {ip_address} 请求频率过高'
+        log_security_event('RATE_LIMIT_EXCEEDED', details, ip_address, user_agent)
         return False
     
     return True
 
+def load_token_user(user_id):
+    """自动登录令牌缓存未命中时读取用户的验证信息"""
+    return db.session.query(User.username, User.password_hash, User.is_active).filter(User.id == user_id).first()
+
+def load_revoked_tokens():
+    """读取未过期的已注销令牌 [(令牌摘要, 过期时间戳)]"""
+    rows = db.session.query(RevokedToken.token_hash, RevokedToken.expires_at).filter(
+        RevokedToken.expires_at > datetime.utcnow()
+    )
+    return [(token_hash, expires_at.replace(tzinfo=timezone.utc).timestamp()) for token_hash, expires_at in rows]
+
+def save_revoked_token(token_hash, expires):
+    """保存已注销的令牌，同时清理已过期的记录"""
+    db.session.query(RevokedToken).filter(RevokedToken.expires_at <= datetime.utcnow()).delete(synchronize_session=False)
+    db.session.merge(RevokedToken(
+        token_hash=token_hash,
+        expires_at=datetime.fromtimestamp(expires, timezone.utc).replace(tzinfo=None)
+    ))
+    db.session.commit()
+
+auto_login_tokens = AutoLoginTokens(
+    app.config['AUTO_LOGIN_SECRET'] or load_or_create_secret(os.path.join(app.instance_path, 'auto_login.key')),
+    load_token_user,
+    max_age=app.config['AUTO_LOGIN_MAX_AGE'],
+    cache_ttl=app.config['AUTO_LOGIN_CACHE_TTL'],
+    load_revoked=load_revoked_tokens,
+    save_revoked=save_revoked_token,
+    revocation_refresh=app.config['AUTO_LOGIN_REVOCATION_REFRESH']
+)
+
+def read_auto_login_cookie():
+    """验证请求中的自动登录cookie，返回 (是否携带cookie, 令牌身份或None)"""
+    token = request.cookies.get('auto_login')
+    if not token:
+        return False, None
+    return True, auto_login_tokens.validate(token)
+
+def load_auto_login_user():
+    """验证自动登录cookie并读取用户，返回 (是否携带cookie, User或None)
+
+    令牌验证结果有缓存，用户可能在缓存期内被删除，读取不到时同时清除该用户的令牌缓存。
+    """
+    has_cookie, identity = read_auto_login_cookie()
+    if not identity:
+        return has_cookie, None
+    user = db.session.get(User, identity.user_id)
+    if user is None:
+        auto_login_tokens.invalidate_user(identity.user_id)
+    return has_cookie, user
+
 def check_ip_blocked(ip_address):
-    """检查IP是否被阻止"""
-    # 检查是否有恶意事件
-    malicious_events = SecurityEvent.query.filter(
-        SecurityEvent.ip_address == ip_address,
-        SecurityEvent.is_blocked == True
-    ).count()
-    
-    return malicious_events > 0
+    """检查IP是否被阻止（查内存黑名单，不访问数据库）"""
+    return ip_blocklist.contains(ip_address)
+
+def load_user_identity(user_id):
+    """读取登录用户的常用字段，构造轻量身份对象"""
+    columns = [getattr(User, field) for field in CachedUser.FIELDS]
+    row = db.session.query(*columns).filter(User.id == user_id).first()
+    return CachedUser(*row) if row else None
+
+user_cache = UserCache(load_user_identity, ttl=app.config['USER_CACHE_TTL'])
+
+def invalidate_user_caches(user_id):
+    """用户信息或账户状态变化后清除相关缓存"""
+    user_cache.invalidate(user_id)
+    auto_login_tokens.invalidate_user(user_id)
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return user_cache.get(int(user_id))
 
 # 安全中间件
 @app.before_request
@@ -266,25 +531,18 @@ def security_middleware():
     
     # 检查速率限制（对非登录页面）
     if not request.path.startswith('/login') and not request.path.startswith('/register'):
-        if not check_rate_limit(ip_address):
-            log_security_event('RATE_LIMIT_EXCEEDED', f'IP {ip_address} 请求频率过高', ip_address, user_agent)
+        user_id = current_user.id if current_user.is_authenticated else None
+        if not check_rate_limit(ip_address, user_id, user_agent):
             return jsonify({'error': '请求过于频繁，请稍后再试'}), 429
     
-    # 记录可疑活动
-    suspicious_patterns = [
-        'sqlmap', 'nikto', 'nmap', 'dirb', 'gobuster', 'wfuzz',  # 安全扫描工具
-        'union select', 'drop table', 'insert into', 'delete from',  # SQL注入
-        '<script', 'javascript:', 'onload=', 'onerror=',  # XSS攻击
-        '../', '..\\', 'etc/passwd', 'windows/system32'  # 路径遍历
-    ]
-    
-    request_string = f"{request.method} {request.path} {request.query_string.decode()} {request.get_data().decode()}"
-    request_string_lower = request_string.lower()
-    
-    for pattern in suspicious_patterns:
-        if pattern in request_string_lower:
-            log_security_event('SUSPICIOUS_ACTIVITY', f'检测到可疑活动: {pattern}', ip_address, user_agent)
-            break
+    # 记录可疑活动（单次正则扫描，请求体只扫描前 SCAN_MAX_BODY_BYTES 字节）
+    pattern = request_scanner.scan(
+        request.path,
+        request.query_string.decode('utf-8', 'replace'),
+        request.environ
+    )
+    if pattern:
+        log_security_event('SUSPICIOUS_ACTIVITY', f'检测到可疑活动: {pattern}', ip_address, user_agent)
 
 @app.route('/')
 def index():
@@ -293,36 +551,16 @@ def index():
         return redirect(url_for('dashboard'))
     
     # 检查是否有自动登录cookie
-    auto_login_cookie = request.cookies.get('auto_login')
-    if auto_login_cookie:
-        try:
-            auto_login_data = json.loads(auto_login_cookie)
-            username = auto_login_data.get('username')
-            timestamp_str = auto_login_data.get('timestamp')
-            token = auto_login_data.get('token')  # 新增安全令牌
-            
-            if username and timestamp_str and token:
-                # 检查cookie是否在30天内
-                timestamp = datetime.fromisoformat(timestamp_str)
-                if datetime.utcnow() - timestamp < timedelta(days=30):
-                    user = User.query.filter_by(username=username).first()
-                    if user:
-                        # 验证安全令牌（简单的哈希验证）
-                        expected_token = hashlib.sha256(f"{username}{timestamp_str}{user.password_hash[:10]}".encode()).hexdigest()
-                        if token == expected_token:
-                            login_user(user, remember=True)
-                            log_action('自动登录', f'用户 {username} 通过安全cookie自动登录', request.remote_addr)
-                            return redirect(url_for('dashboard'))
-                        else:
-                            # 令牌无效，清除cookie
-                            response = make_response(redirect(url_for('login')))
-                            response.delete_cookie('auto_login')
-                            return response
-        except (json.JSONDecodeError, ValueError, KeyError):
-            # 清除无效的cookie
-            response = make_response(redirect(url_for('login')))
-            response.delete_cookie('auto_login')
-            return response
+    has_cookie, user = load_auto_login_user()
+    if user:
+        login_user(user, remember=True)
+        log_action('自动登录', f'用户 {user.username} 通过安全cookie自动登录', request.remote_addr)
+        return redirect(url_for('dashboard'))
+    if has_cookie:
+        # 令牌无效或用户已删除，清除cookie
+        response = make_response(redirect(url_for('login')))
+        response.delete_cookie('auto_login')
+        return response
     
     return redirect(url_for('login'))
 
@@ -339,7 +577,7 @@ def login():
         return render_template('login.html'), 403
     
     # 检查速率限制
-    if not check_rate_limit(ip_address):
+    if not check_rate_limit(ip_address, user_agent=user_agent):
         flash('请求过于频繁，请稍后再试')
         return render_template('login.html'), 429
     
@@ -351,31 +589,17 @@ def login():
     if app.config['AUTO_LOGIN_ENABLED']:
         # 检查设备信任
         device_hash = generate_device_hash(ip_address, user_agent)
-        auto_login_cookie = request.cookies.get('auto_login')
+        _, user = load_auto_login_user()
         
-        if auto_login_cookie:
-            try:
-                auto_login_data = json.loads(auto_login_cookie)
-                username = auto_login_data.get('username')
-                timestamp_str = auto_login_data.get('timestamp')
-                token = auto_login_data.get('token')
-                
-                if username and timestamp_str and token:
-                    timestamp = datetime.fromisoformat(timestamp_str)
-                    if datetime.utcnow() - timestamp < timedelta(days=30):
-                        user = User.query.filter_by(username=username).first()
-                        if user:
-                            expected_token = hashlib.sha256(f"{username}{timestamp_str}{user.password_hash[:10]}".encode()).hexdigest()
-                            if token == expected_token:
-                                # 检查设备是否受信任
-                                if is_device_trusted(user.id, device_hash, ip_address) or is_trusted_ip(ip_address):
-                                    login_user(user, remember=True)
-                                    user.last_login = datetime.utcnow()
-                                    db.session.commit()
-                                    log_action('自动登录', f'用户 {username} 通过受信任设备自动登录', ip_address)
-                                    return redirect(url_for('dashboard'))
-            except (json.JSONDecodeError, ValueError, KeyError):
-                pass
+        if user:
+            # 检查设备是否受信任
+            if is_device_trusted(user.id, device_hash, ip_address) or is_trusted_ip(ip_address):
+                login_user(user, remember=True)
+                user.last_login = datetime.utcnow()
+                db.session.commit()
+                user_cache.invalidate(user.id)
+                log_action('自动登录', f'用户 {user.username} 通过受信任设备自动登录', ip_address)
+                return redirect(url_for('dashboard'))
     
     if request.method == 'POST':
         username = sanitize_input(request.form.get('username'))
@@ -389,7 +613,13 @@ def login():
         
         user = User.query.filter_by(username=username).first()
         
-        if user and check_password_hash(user.password_hash, password):
+        try:
+            password_ok = user is not None and password_hasher.verify(user.password_hash, password)
+        except PasswordHasherBusy:
+            flash('登录人数较多，请稍后再试')
+            return render_template('login.html'), 503
+        
+        if password_ok:
             # 检查用户状态
             if hasattr(user, 'is_active') and not user.is_active:
                 flash('账户已被禁用，请联系管理员')
@@ -403,9 +633,22 @@ def login():
             # 验证通过，执行登录
             login_user(user, remember=remember_me)
             
+            # 哈希算法或强度低于当前配置时重新生成（繁忙时跳过，下次登录再升级）
+            try:
+                new_hash = password_hasher.rehash_if_needed(user.password_hash, password)
+            except PasswordHasherBusy:
+                new_hash = None
+            if new_hash:
+                user.password_hash = new_hash
+            
             # 更新最后登录时间
             user.last_login = datetime.utcnow()
             db.session.commit()
+            if new_hash:
+                # 自动登录令牌绑定了密码哈希，升级后旧令牌失效
+                invalidate_user_caches(user.id)
+            else:
+                user_cache.invalidate(user.id)
             
             # 记录登录日志
             log_action('用户登录', f'用户 {username} 登录系统', ip_address)
@@ -415,19 +658,13 @@ def login():
                 add_trusted_device(user.id, ip_address, user_agent)
                 log_action('添加受信任设备', f'用户 {username} 添加了受信任设备', ip_address)
             
-            # 如果选择了记住我，设置安全cookie
-            if remember_me:
+            # 如果选择了记住我（或哈希升级前已有自动登录cookie），设置安全cookie
+            if remember_me or (new_hash and request.cookies.get('auto_login')):
                 response = make_response(redirect(url_for('dashboard')))
-                timestamp = datetime.utcnow().isoformat()
-                auto_login_data = {
-                    'username': username,
-                    'timestamp': timestamp,
-                    'token': hashlib.sha256(f"{username}{timestamp}{user.password_hash[:10]}".encode()).hexdigest()
-                }
                 response.set_cookie(
                     'auto_login',
-                    json.dumps(auto_login_data),
-                    max_age=30*24*60*60,  # 30天
+                    auto_login_tokens.issue(user.id, user.password_hash),
+                    max_age=app.config['AUTO_LOGIN_MAX_AGE'],  # 30天
                     httponly=True,
                     secure=False,  # 在生产环境中设置为True（HTTPS）
                     samesite='Lax'
@@ -443,7 +680,8 @@ def login():
             
             # 记录安全事件
             log_security_event('LOGIN_FAILED', f'用户 {username} 登录失败', ip_address, user_agent)
-            log_action('登录失败', f'用户 {username} 登录失败', ip_address)
+            if user:
+                log_action('登录失败', f'用户 {username} 登录失败', ip_address, user=user)
             flash('用户名或密码错误')
     
     return render_template('login.html')
@@ -482,7 +720,7 @@ def register():
             # 创建用户
             user = User(
                 username=username,
-                password_hash=generate_password_hash(password),
+                password_hash=password_hasher.hash(password),
                 name=name,
                 role=role,
                 email=email,
@@ -491,9 +729,10 @@ def register():
             
             db.session.add(user)
             db.session.commit()
+            invalidate_user_caches(user.id)
             
             # 记录注册日志
-            log_action('用户注册', f'新用户 {username} 注册系统')
+            log_action('用户注册', f'新用户 {username} 注册系统', user=user)
             
             flash('注册成功，请登录')
             return redirect(url_for('login'))
@@ -518,28 +757,13 @@ def check_login_status():
             }
         })
     
-    # 检查是否有有效的自动登录cookie
-    auto_login_cookie = request.cookies.get('auto_login')
-    if auto_login_cookie:
-        try:
-            auto_login_data = json.loads(auto_login_cookie)
-            username = auto_login_data.get('username')
-            timestamp_str = auto_login_data.get('timestamp')
-            token = auto_login_data.get('token')
-            
-            if username and timestamp_str and token:
-                timestamp = datetime.fromisoformat(timestamp_str)
-                if datetime.utcnow() - timestamp < timedelta(days=30):
-                    user = User.query.filter_by(username=username).first()
-                    if user:
-                        expected_token = hashlib.sha256(f"{username}{timestamp_str}{user.password_hash[:10]}".encode()).hexdigest()
-                        if token == expected_token:
-                            return jsonify({
-                                'auto_login_available': True,
-                                'username': username
-                            })
-        except (json.JSONDecodeError, ValueError, KeyError):
-            pass
+    # 检查是否有有效的自动登录cookie（命中缓存时不查询数据库）
+    _, identity = read_auto_login_cookie()
+    if identity:
+        return jsonify({
+            'auto_login_available': True,
+            'username': identity.username
+        })
     
     return jsonify({
         'logged_in': False,
@@ -549,30 +773,19 @@ def check_login_status():
 @app.route('/api/auto-login')
 def auto_login():
     """执行自动登录"""
-    auto_login_cookie = request.cookies.get('auto_login')
-    if auto_login_cookie:
-        try:
-            auto_login_data = json.loads(auto_login_cookie)
-            username = auto_login_data.get('username')
-            timestamp_str = auto_login_data.get('timestamp')
-            token = auto_login_data.get('token')
-            
-            if username and timestamp_str and token:
-                timestamp = datetime.fromisoformat(timestamp_str)
-                if datetime.utcnow() - timestamp < timedelta(days=30):
-                    user = User.query.filter_by(username=username).first()
-                    if user:
-                        expected_token = hashlib.sha256(f"{username}{timestamp_str}{user.password_hash[:10]}".encode()).hexdigest()
-                        if token == expected_token:
-                            login_user(user, remember=True)
-                            user.last_login = datetime.utcnow()
-                            db.session.commit()
-                            log_action('自动登录', f'用户 {username} 通过API自动登录', request.remote_addr)
-                            return jsonify({'success': True, 'redirect': url_for('dashboard')})
-        except (json.JSONDecodeError, ValueError, KeyError):
-            pass
-    
-    return jsonify({'success': False, 'error': '自动登录失败'})
+    has_cookie, user = load_auto_login_user()
+    if user:
+        login_user(user, remember=True)
+        user.last_login = datetime.utcnow()
+        db.session.commit()
+        user_cache.invalidate(user.id)
+        log_action('自动登录', f'用户 {user.username} 通过API自动登录', request.remote_addr)
+        return jsonify({'success': True, 'redirect': url_for('dashboard')})
+    
+    response = jsonify({'success': False, 'error': '自动登录失败'})
+    if has_cookie:
+        response.delete_cookie('auto_login')
+    return response
 
 @app.route('/api/update-contact-info', methods=['POST'])
 @login_required
@@ -602,10 +815,12 @@ def update_contact_info():
         if existing_user:
             return jsonify({'success': False, 'error': '该手机号已被使用'})
     
-    # 更新联系信息
-    current_user.email = email
-    current_user.phone = phone
+    # 更新联系信息（current_user 是缓存的身份对象，需要加载ORM对象修改）
+    user = db.session.get(User, current_user.id)
+    user.email = email
+    user.phone = phone
     db.session.commit()
+    invalidate_user_caches(user.id)
     
     log_action('更新联系信息', f'用户更新了联系信息')
     
@@ -648,35 +863,110 @@ def remove_trusted_device(device_id):
     
     return jsonify({'success': True})
 
+def encode_audit_cursor(created_at, row_id):
+    return f'{created_at.isoformat()}_{row_id}'
+
+def decode_audit_cursor(cursor):
+    """解析日志/安全事件游标，返回 (created_at, id)"""
+    created_at, row_id = cursor.rsplit('_', 1)
+    return datetime.fromisoformat(created_at), int(row_id)
+
+def match_condition(column, value, mode):
+    """按匹配方式生成筛选条件：exact 精确匹配、prefix 前缀匹配（均可使用索引），contains 包含匹配（全表扫描）"""
+    if mode == 'exact':
+        return column == value
+    if mode == 'prefix':
+        if DATABASE_BACKEND != 'sqlite':
+            # 按字符比较的前缀匹配，数据库使用 C 排序规则时可以使用索引
+            return column.startswith(value, autoescape=True)
+        # 用范围比较代替 LIKE 'x%'，SQLite 的 LIKE 不区分大小写而无法使用普通索引
+        return db.and_(column >= value, column < value + '\U0010ffff')
+    return like_condition(column, f'%{escape_like(value)}%')
+
+def audit_page(model, conditions, cursor, per_page, include_archive=False, start=None, end=None):
+    """按 (created_at, id) 倒序的游标分页，返回 (本页记录, 下一页游标)
+    
+    include_archive 时，在线表的记录不足一页则继续从归档月份读取（归档记录都早于在线记录）。
+    start/end 为时间筛选范围，用于跳过不相关的归档月份。
+    """
+    query = model.query.filter(*conditions)
+    if cursor:
+        query = query.filter(db.tuple_(model.created_at, model.id) < cursor)
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(per_page + 1).all()
+    
+    if include_archive and len(rows) <= per_page:
+        archive_cursor = (rows[-1].created_at, rows[-1].id) if rows else cursor
+        rows += audit_archive.read_page(model.__table__, conditions, archive_cursor,
+                                        per_page + 1 - len(rows), start=start, end=end)
+    
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    next_cursor = encode_audit_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+    return rows, next_cursor
+
+def audit_total(model, conditions, mode):
+    """按需计算总数，返回 (total, 是否精确)
+    
+    approx：未筛选时用ID范围估算；有筛选时最多数到 AUDIT_APPROX_COUNT_LIMIT 条。
+    exact：COUNT(*)，表很大时较慢。
+    """
+    query = model.query.filter(*conditions)
+    if mode == 'exact':
+        return query.count(), True
+    if mode != 'approx':
+        return None, None
+    if not conditions:
+        low, high = db.session.query(db.func.min(model.id), db.func.max(model.id)).one()
+        return (high - low + 1 if high is not None else 0), False
+    cap = app.config['AUDIT_APPROX_COUNT_LIMIT']
+    count = db.session.query(db.func.count()).select_from(
+        query.with_entities(model.id).limit(cap + 1).subquery()
+    ).scalar()
+    return min(count, cap), count <= cap
+
+def parse_audit_args():
+    """读取日志和安全事件接口共用的分页参数，格式错误时抛出 ValueError"""
+    per_page = max(1, min(request.args.get('per_page', 50, type=int), app.config['AUDIT_MAX_PAGE_SIZE']))
+    cursor = request.args.get('cursor')
+    cursor = decode_audit_cursor(cursor) if cursor else None
+    match = request.args.get('match', 'exact')
+    total_mode = request.args.get('total', '')
+    if match not in ('exact', 'prefix', 'contains') or total_mode not in ('', 'approx', 'exact'):
+        raise ValueError
+    include_archive = request.args.get('archive', '1') != '0'
+    return per_page, cursor, match, total_mode, include_archive
+
 @app.route('/api/security-events', methods=['GET'])
 @login_required
 def get_security_events():
-    """获取安全事件（仅管理员）"""
+    """获取安全事件（仅管理员）
+    
+    查询参数：event_type、ip_address、match（exact 默认 / prefix / contains）、
+    per_page、cursor（按时间倒序的游标分页）、total（approx 估算 / exact 精确，不传则不计算，只统计在线表）、
+    archive（默认1，在线记录翻完后继续读取归档月份；0 只查在线表）。
+    """
     if current_user.role != 'manager':
         return jsonify({'error': '无权限'}), 403
     
-    # 获取查询参数
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 50, type=int)
+    try:
+        per_page, cursor, match, total_mode, include_archive = parse_audit_args()
+    except ValueError:
+        return jsonify({'error': '参数格式不正确'}), 400
     event_type = request.args.get('event_type', '')
     ip_address = request.args.get('ip_address', '')
     
-    # 构建查询
-    query = SecurityEvent.query
-    
+    # 构建筛选条件
+    conditions = []
     if event_type:
-        query = query.filter(SecurityEvent.event_type.contains(event_type))
+        conditions.append(match_condition(SecurityEvent.event_type, event_type, match))
     if ip_address:
-        query = query.filter(SecurityEvent.ip_address.contains(ip_address))
-    
-    # 按时间倒序排列
-    query = query.order_by(SecurityEvent.created_at.desc())
+        conditions.append(match_condition(SecurityEvent.ip_address, ip_address, match))
     
-    # 分页
-    events = query.paginate(page=page, per_page=per_page, error_out=False)
+    total, total_exact = audit_total(SecurityEvent, conditions, total_mode)
+    events, next_cursor = audit_page(SecurityEvent, conditions, cursor, per_page, include_archive)
     
     event_list = []
-    for event in events.items:
+    for event in events:
         event_list.append({
             'id': event.id,
             'ip_address': event.ip_address,
@@ -684,28 +974,76 @@ def get_security_events():
             'event_details': event.event_details,
             'user_agent': event.user_agent,
             'created_at': event.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'is_blocked': event.is_blocked
+            'is_blocked': ip_blocklist.contains(event.ip_address)
         })
     
     return jsonify({
         'events': event_list,
-        'total': events.total,
-        'pages': events.pages,
-        'current_page': page
+        'next_cursor': next_cursor,
+        'total': total,
+        'total_exact': total_exact
     })
 
-@app.route('/api/block-ip/<ip_address>', methods=['POST'])
+@app.route('/api/metrics')
+@login_required
+def get_metrics():
+    """运行指标（仅领导）：密码哈希进程池的排队深度、审计日志写入计数"""
+    if current_user.role != 'manager':
+        return jsonify({'error': '无权限'}), 403
+    
+    return jsonify({
+        'password_hashing': password_hasher.stats(),
+        'audit_log': {'written': audit_writer.written, 'dropped': audit_writer.dropped}
+    })
+
+@app.route('/api/block-ip/<path:ip_address>', methods=['POST'])
 @login_required
 def block_ip(ip_address):
-    """阻止IP地址（仅管理员）"""
+    """阻止IP地址或CIDR网段（仅管理员）"""
+    if current_user.role != 'manager':
+        return jsonify({'error': '无权限'}), 403
+    
+    try:
+        network = str(normalize_network(ip_address))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'IP地址格式不正确'}), 400
+    
+    if not BlockedIP.query.filter_by(ip_address=network).first():
+        data = request.get_json(silent=True) or {}
+        blocked = BlockedIP(
+            ip_address=network,
+            reason=sanitize_input(data.get('reason')),
+            blocked_by=current_user.id
+        )
+        db.session.add(blocked)
+        db.session.commit()
+        ip_blocklist.invalidate()
+    
+    log_action('阻止IP', f'管理员阻止了IP: {network}')
+    
+    return jsonify({'success': True})
+
+@app.route('/api/block-ip/<path:ip_address>', methods=['DELETE'])
+@login_required
+def unblock_ip(ip_address):
+    """解除IP地址或CIDR网段的阻止（仅管理员）"""
     if current_user.role != 'manager':
         return jsonify({'error': '无权限'}), 403
     
-    # 标记该IP的所有安全事件为阻止状态
-    SecurityEvent.query.filter_by(ip_address=ip_address).update({'is_blocked': True})
+    try:
+        network = str(normalize_network(ip_address))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'IP地址格式不正确'}), 400
+    
+    blocked = BlockedIP.query.filter_by(ip_address=network).first()
+    if not blocked:
+        return jsonify({'success': False, 'error': '该IP未被阻止'}), 404
+    
+    db.session.delete(blocked)
     db.session.commit()
+    ip_blocklist.invalidate()
     
-    log_action('阻止IP', f'管理员阻止了IP: {ip_address}')
+    log_action('解除IP阻止', f'管理员解除了IP阻止: {network}')
     
     return jsonify({'success': True})
 
@@ -719,7 +1057,8 @@ def logout():
     
     logout_user()
     response = make_response(redirect(url_for('login')))
-    # 清除自动登录cookie
+    # 注销并清除自动登录cookie
+    auto_login_tokens.revoke(request.cookies.get('auto_login'))
     response.delete_cookie('auto_login')
     return response
 
@@ -733,60 +1072,287 @@ def dashboard():
 def security_settings():
     return render_template('security_settings.html')
 
+def task_list_query():
+    """任务列表查询：一次JOIN取出任务和所属用户，只投影需要的列"""
+    return db.session.query(
+        Task.id,
+        Task.title,
+        Task.description,
+        Task.date,
+        Task.status,
+        Task.priority,
+        User.name,
+        Task.user_id,
+        User.username
+    ).join(User, Task.user_id == User.id)
+
+def serialize_task_rows(rows):
+    """把 task_list_query 的结果行直接转换为可JSON序列化的字典"""
+    return [
+        {
+            'id': task_id,
+            'title': title,
+            'description': description,
+            'date': task_date.isoformat(),
+            'status': status,
+            'priority': priority,
+            'user_name': user_name,
+            'user_id': user_id,
+            'user_username': user_username  # 添加用户名用于标识
+        }
+        for task_id, title, description, task_date, status, priority, user_name, user_id, user_username in rows
+    ]
+
+def record_task_stat(user_id, task_date, priority, delta):
+    """在当前事务中更新任务日统计汇总"""
+    adjust_daily_stat(db.session, TaskDailyStat.__table__, user_id, task_date, priority, delta)
+
+def bump_task_month(task_date):
+    """在当前事务中把任务所在月份的版本号加一"""
+    month = task_date.strftime('%Y-%m')
+    table = TaskMonthVersion.__table__
+    result = db.session.execute(
+        table.update().where(table.c.month == month).values(version=table.c.version + 1)
+    )
+    if result.rowcount == 0:
+        db.session.execute(table.insert().values(month=month, version=1))
+
+def record_task_change(task, action):
+    """在当前事务中追加一条任务变更记录（新建的任务需先 flush 取得ID）"""
+    change = TaskChange(task_id=task.id, user_id=task.user_id, action=action)
+    db.session.add(change)
+    db.session.flush()
+    
+    # 每100条清理一次超出保留数量的旧记录
+    retain = app.config['TASK_CHANGES_RETAIN']
+    if change.id % 100 == 0 and change.id > retain:
+        db.session.execute(TaskChange.__table__.delete().where(TaskChange.id <= change.id - retain))
+    return change.id
+
+def publish_task_event(action, task_id, user_id, version):
+    """任务修改提交后推送给 SSE 订阅者，客户端收到后通过 /api/tasks/changes 增量同步"""
+    try:
+        event_bus.publish('tasks', {'action': action, 'task_id': task_id, 'user_id': user_id, 'version': version})
+    except Exception as e:
+        print(f"任务事件推送失败: {e}")
+
+def current_task_version():
+    return db.session.query(db.func.max(TaskChange.id)).scalar() or 0
+
+def rebuild_task_daily_stats():
+    """根据任务表重建日统计汇总（批量导入任务后调用）"""
+    rebuild_daily_stats(db.session, Task.__table__, TaskDailyStat.__table__)
+    db.session.commit()
+
+_task_search_ready = False
+
+def task_search_ready():
+    """全文索引表是否已创建（由迁移创建，非 SQLite 或不支持 FTS5 时不存在）"""
+    global _task_search_ready
+    if not _task_search_ready:
+        _task_search_ready = task_search.index_exists(db.session.connection())
+    return _task_search_ready
+
+def rebuild_task_search_index():
+    """根据任务表重建全文索引（批量导入任务后调用）"""
+    if task_search_ready():
+        task_search.rebuild_index(db.session, Task.__table__)
+        db.session.commit()
+
+def parse_date_arg(name):
+    """读取 YYYY-MM-DD 格式的查询参数，未提供时返回 None"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def calendar_window(month):
+    """计算日历视图显示的日期范围：从当月1日所在周的周日开始，共42天"""
+    first_day = datetime.strptime(month, '%Y-%m').date()
+    start = first_day - timedelta(days=(first_day.weekday() + 1) % 7)
+    return start, start + timedelta(days=41)
+
+def encode_task_cursor(task_date, task_id):
+    return f'{task_date.isoformat()}_{task_id}'
+
+def decode_task_cursor(cursor):
+    """解析游标，返回 (date, id)"""
+    date_str, task_id = cursor.split('_', 1)
+    return datetime.strptime(date_str, '%Y-%m-%d').date(), int(task_id)
+
+def filter_task_query(query, start_date=None, end_date=None, user_id=None, priority=None):
+    """按日期范围、用户和优先级筛选任务"""
+    if start_date:
+        query = query.filter(Task.date >= start_date)
+    if end_date:
+        query = query.filter(Task.date <= end_date)
+    if user_id:
+        query = query.filter(Task.user_id == user_id)
+    if priority:
+        query = query.filter(Task.priority == priority)
+    return query
+
 @app.route('/api/tasks', methods=['GET'])
 @login_required
 def get_tasks():
+    """获取任务列表
+    
+    查询参数：start_date/end_date（YYYY-MM-DD）、month（YYYY-MM，日历显示的42天窗口）、
+    user_id（仅领导）、priority、limit/cursor（按日期和ID倒序的游标分页）。
+    不带 limit 时返回任务数组，带 limit 时返回 {'tasks': [...], 'next_cursor': ..., 'version': ...}，
+    version 为任务变更日志的当前版本，可用于 /api/tasks/changes 增量同步。
+    """
+    try:
+        start_date = parse_date_arg('start_date')
+        end_date = parse_date_arg('end_date')
+        month = request.args.get('month')
+        if month:
+            window_start, window_end = calendar_window(month)
+            start_date = max(start_date, window_start) if start_date else window_start
+            end_date = min(end_date, window_end) if end_date else window_end
+        cursor = request.args.get('cursor')
+        cursor = decode_task_cursor(cursor) if cursor else None
+        limit = request.args.get('limit', type=int)
+    except ValueError:
+        return jsonify({'error': '参数格式不正确'}), 400
+    
     if current_user.role == 'manager':
-        # 领导可以看到所有任务
-        tasks = Task.query.all()
+        # 领导可以看到所有任务，可按员工筛选
+        user_id = request.args.get('user_id', type=int)
     else:
         # 职员只能看到自己的任务
-        tasks = Task.query.filter_by(user_id=current_user.id).all()
-    
-    task_list = []
-    for task in tasks:
-        task_list.append({
-            'id': task.id,
-            'title': task.title,
-            'description': task.description,
-            'date': task.date.strftime('%Y-%m-%d'),
-            'status': task.status,
-            'priority': task.priority,
-            'user_name': task.user.name,
-            'user_id': task.user_id,
-            'user_username': task.user.username  # 添加用户名用于标识
-        })
+        user_id = current_user.id
+    
+    query = filter_task_query(
+        task_list_query(),
+        start_date=start_date,
+        end_date=end_date,
+        user_id=user_id,
+        priority=request.args.get('priority')
+    )
+    
+    if cursor:
+        cursor_date, cursor_id = cursor
+        query = query.filter(db.or_(
+            Task.date < cursor_date,
+            db.and_(Task.date == cursor_date, Task.id < cursor_id)
+        ))
+    query = query.order_by(Task.date.desc(), Task.id.desc())
+    
+    if limit is None:
+        task_list = serialize_task_rows(query.all())
+        payload = task_list
+    else:
+        limit = max(1, min(limit, app.config['TASKS_MAX_PAGE_SIZE']))
+        version = current_task_version()
+        # 多取一行用于判断是否还有下一页
+        rows = query.limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        task_list = serialize_task_rows(rows)
+        payload = {
+            'tasks': task_list,
+            'next_cursor': encode_task_cursor(rows[-1].date, rows[-1].id) if has_more else None,
+            'version': version
+        }
     
     # 记录查看任务日志
-    log_action('查看任务列表', f'用户查看了 {len(tasks)} 个任务')
+    log_action('查看任务列表', f'用户查看了 {len(task_list)} 个任务')
     
-    return jsonify(task_list)
+    return jsonify(payload)
 
-@app.route('/api/tasks', methods=['POST'])
-@login_required
-def create_task():
-    # 领导不能创建任务
-    if current_user.role == 'manager':
-        return jsonify({'error': '领导不能创建任务'}), 403
-    
-    data = request.get_json()
-    task_date = datetime.strptime(data['date'], '%Y-%m-%d').date()
+def parse_task_date(value):
+    """解析任务日期并检查5天限制，不符合时抛出 ValueError"""
+    try:
+        task_date = datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise ValueError('日期格式不正确')
     today = datetime.now().date()
     
     # 检查日期限制：只能填写最近一天往前5天的工作内容
     if task_date > today or task_date < today - timedelta(days=5):
-        return jsonify({'error': '只能填写最近一天往前5天的工作内容'}), 400
-    
+        raise ValueError('只能填写最近一天往前5天的工作内容')
+    return task_date
+
+# PostgreSQL 事务级咨询锁的键，串行化任务写入
+TASK_WRITE_LOCK_KEY = 0x7461736b
+
+def lock_task_writes():
+    """数据库服务器上串行化任务写入事务（锁在事务结束时释放）
+    
+    变更日志的ID在插入时分配，并发事务可能先分配后提交，增量同步会漏掉较小的ID；
+    月份版本和日统计的"先更新、无行再插入"也会并发冲突。SQLite 只有一个写连接，无需加锁。
+    """
+    if DATABASE_BACKEND == 'postgresql':
+        db.session.execute(db.text('SELECT pg_advisory_xact_lock(:key)'), {'key': TASK_WRITE_LOCK_KEY})
+
+def apply_task_create(data, task_date, user_id):
+    """在当前事务中新建任务并更新统计、月份版本和变更日志，返回 (任务, 变更版本)"""
+    lock_task_writes()
     task = Task(
         title=data['title'],
         description=data.get('description', ''),
         date=task_date,
         priority=data.get('priority', 'medium'),
-        user_id=current_user.id
+        user_id=user_id
     )
     
     db.session.add(task)
+    db.session.flush()
+    record_task_stat(task.user_id, task.date, task.priority, 1)
+    bump_task_month(task.date)
+    if task_search_ready():
+        task_search.index_task(db.session, task.id, task.title, task.description)
+    return task, record_task_change(task, 'upsert')
+
+def apply_task_update(task, data, task_date):
+    """在当前事务中更新任务，返回变更版本"""
+    lock_task_writes()
+    old_date, old_priority = task.date, task.priority
+    old_text = (task.title, task.description)
+    task.title = data.get('title', task.title)
+    task.description = data.get('description', task.description)
+    task.date = task_date
+    task.status = data.get('status', task.status)
+    task.priority = data.get('priority', task.priority)
+    
+    if (old_date, old_priority) != (task.date, task.priority):
+        record_task_stat(task.user_id, old_date, old_priority, -1)
+        record_task_stat(task.user_id, task.date, task.priority, 1)
+    bump_task_month(old_date)
+    if old_date.strftime('%Y-%m') != task.date.strftime('%Y-%m'):
+        bump_task_month(task.date)
+    if old_text != (task.title, task.description) and task_search_ready():
+        task_search.index_task(db.session, task.id, task.title, task.description)
+    return record_task_change(task, 'upsert')
+
+def apply_task_delete(task):
+    """在当前事务中删除任务，返回变更版本"""
+    lock_task_writes()
+    record_task_stat(task.user_id, task.date, task.priority, -1)
+    bump_task_month(task.date)
+    if task_search_ready():
+        task_search.remove_task(db.session, task.id)
+    version = record_task_change(task, 'delete')
+    db.session.delete(task)
+    return version
+
+@app.route('/api/tasks', methods=['POST'])
+@login_required
+def create_task():
+    # 领导不能创建任务
+    if current_user.role == 'manager':
+        return jsonify({'error': '领导不能创建任务'}), 403
+    
+    data = request.get_json()
+    try:
+        task_date = parse_task_date(data['date'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    task, version = apply_task_create(data, task_date, current_user.id)
     db.session.commit()
+    publish_task_event('upsert', task.id, task.user_id, version)
     
     # 记录创建任务日志
     log_action('创建任务', f'创建任务: {data["title"]} (日期: {data["date"]})')
@@ -807,21 +1373,15 @@ def update_task(task_id):
         return jsonify({'error': '无权限'}), 403
     
     data = request.get_json()
-    task_date = datetime.strptime(data['date'], '%Y-%m-%d').date()
-    today = datetime.now().date()
-    
-    # 检查日期限制：只能填写最近一天往前5天的工作内容
-    if task_date > today or task_date < today - timedelta(days=5):
-        return jsonify({'error': '只能填写最近一天往前5天的工作内容'}), 400
+    try:
+        task_date = parse_task_date(data['date'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     old_title = task.title
-    task.title = data.get('title', task.title)
-    task.description = data.get('description', task.description)
-    task.date = task_date
-    task.status = data.get('status', task.status)
-    task.priority = data.get('priority', task.priority)
-    
+    version = apply_task_update(task, data, task_date)
     db.session.commit()
+    publish_task_event('upsert', task.id, task.user_id, version)
     
     # 记录更新任务日志
     log_action('更新任务', f'更新任务: {old_title} -> {task.title} (日期: {data["date"]})')
@@ -842,68 +1402,509 @@ def delete_task(task_id):
         return jsonify({'error': '无权限'}), 403
     
     task_title = task.title
-    db.session.delete(task)
+    version = apply_task_delete(task)
     db.session.commit()
+    publish_task_event('delete', task_id, current_user.id, version)
     
     # 记录删除任务日志
     log_action('删除任务', f'删除任务: {task_title}')
     
     return jsonify({'message': '任务删除成功'})
 
+def is_task_id(value):
+    """JSON 中的整数任务ID（true/false 在 Python 中也是 int，需要排除）"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+TASK_PRIORITIES = ('low', 'medium', 'high')
+
+def check_task_fields(op):
+    """检查批量操作中新建/更新的字段类型和取值，不符合时抛出 ValueError"""
+    title = op.get('title')
+    if op['op'] == 'create' or 'title' in op:
+        if not isinstance(title, str) or not title.strip():
+            raise ValueError('任务标题不能为空')
+    for field in ('description', 'status'):
+        if field in op and not isinstance(op[field], str):
+            raise ValueError(f'{field} 必须是字符串')
+    if 'priority' in op and op['priority'] not in TASK_PRIORITIES:
+        raise ValueError('priority 必须是 low、medium 或 high')
+
+@app.route('/api/tasks/batch', methods=['POST'])
+@login_required
+def batch_tasks():
+    """批量新建、更新、删除任务
+    
+    请求体: {"operations": [{"op": "create", "title", "date", ...},
+                            {"op": "update", "id", "date", ...},
+                            {"op": "delete", "id"}]}
+    先校验全部操作，任意一项不通过时不做任何修改并返回400；
+    全部通过时在一个事务中执行，只写一条汇总操作日志。两种情况都返回逐项结果 results。
+    """
+    if current_user.role == 'manager':
+        return jsonify({'error': '管理员只能查看任务，不能编辑'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations')
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'operations 必须是非空数组'}), 400
+    if len(operations) > app.config['TASK_BATCH_MAX']:
+        return jsonify({'error': f'单次最多 {app.config["TASK_BATCH_MAX"]} 个操作'}), 400
+    
+    # 一次查询取出所有要更新或删除的任务
+    task_ids = [op.get('id') for op in operations if isinstance(op, dict) and op.get('op') in ('update', 'delete')]
+    existing = {}
+    valid_ids = [task_id for task_id in task_ids if is_task_id(task_id)]
+    if valid_ids:
+        existing = {task.id: task for task in Task.query.filter(Task.id.in_(valid_ids)).all()}
+    
+    # 1. 校验
+    results = []
+    plan = []
+    seen_ids = set()
+    for index, op in enumerate(operations):
+        result = {'index': index, 'op': op.get('op') if isinstance(op, dict) else None}
+        try:
+            if not isinstance(op, dict) or op.get('op') not in ('create', 'update', 'delete'):
+                raise ValueError('op 必须是 create、update 或 delete')
+            task = None
+            if op['op'] != 'create':
+                task_id = op.get('id')
+                task = existing.get(task_id) if is_task_id(task_id) else None
+                if task is None:
+                    raise ValueError('任务不存在')
+                if task.user_id != current_user.id:
+                    raise ValueError('无权限')
+                if task_id in seen_ids:
+                    raise ValueError('同一任务在一次批量操作中只能出现一次')
+                seen_ids.add(task_id)
+                result['id'] = task_id
+            task_date = None
+            if op['op'] != 'delete':
+                check_task_fields(op)
+                task_date = parse_task_date(op.get('date'))
+            plan.append((op, task, task_date))
+            result['ok'] = True
+        except ValueError as e:
+            result['ok'] = False
+            result['error'] = str(e)
+        results.append(result)
+    
+    if not all(result['ok'] for result in results):
+        return jsonify({'error': '批量操作校验失败，未做任何修改', 'results': results}), 400
+    
+    # 2. 在一个事务中执行
+    counts = {'create': 0, 'update': 0, 'delete': 0}
+    titles = []
+    version = None
+    for result, (op, task, task_date) in zip(results, plan):
+        if op['op'] == 'create':
+            task, version = apply_task_create(op, task_date, current_user.id)
+            result['id'] = task.id
+        elif op['op'] == 'update':
+            version = apply_task_update(task, op, task_date)
+        else:
+            version = apply_task_delete(task)
+        counts[op['op']] += 1
+        titles.append(task.title)
+    db.session.commit()
+    publish_task_event('batch', None, current_user.id, version)
+    
+    # 一条汇总日志
+    summary = f'新建 {counts["create"]} 个，更新 {counts["update"]} 个，删除 {counts["delete"]} 个'
+    shown = '、'.join(titles[:20]) + (' 等' if len(titles) > 20 else '')
+    log_action('批量操作任务', f'{summary}: {shown}')
+    
+    return jsonify({'message': '批量操作成功', 'results': results})
+
+@app.route('/api/tasks/search')
+@login_required
+def search_tasks():
+    """按关键词搜索任务标题和描述，结果按相关度排序
+    
+    查询参数：q（必填）、user_id（仅领导）、start_date/end_date、page（从1开始）、limit。
+    全文索引不可用时退化为按日期倒序的 LIKE 匹配。
+    """
+    keyword = (request.args.get('q') or '').strip()
+    match = task_search.build_match_query(keyword)
+    if not match:
+        return jsonify({'error': '请输入搜索关键词'}), 400
+    
+    try:
+        start_date = parse_date_arg('start_date')
+        end_date = parse_date_arg('end_date')
+        page = max(1, int(request.args.get('page', 1)))
+        limit = int(request.args.get('limit', 20))
+        user_id = request.args.get('user_id', type=int) if current_user.role == 'manager' else current_user.id
+    except ValueError:
+        return jsonify({'error': '参数格式不正确'}), 400
+    limit = max(1, min(limit, app.config['TASK_SEARCH_MAX_PAGE_SIZE']))
+    offset = (page - 1) * limit
+    
+    # 多取一条用于判断是否还有下一页
+    if task_search_ready():
+        ids = task_search.search_task_ids(
+            db.session, match,
+            user_id=user_id,
+            start_date=start_date.isoformat() if start_date else None,
+            end_date=end_date.isoformat() if end_date else None,
+            limit=limit + 1,
+            offset=offset
+        )
+        has_more = len(ids) > limit
+        ids = ids[:limit]
+        rows = task_list_query().filter(Task.id.in_(ids)).all() if ids else []
+        order = {task_id: position for position, task_id in enumerate(ids)}
+        rows.sort(key=lambda row: order[row.id])
+    else:
+        # 未建全文索引（非 SQLite 或不支持 FTS5）时按空格分词，每个词都需出现在标题或描述中
+        query = filter_task_query(task_list_query(), start_date=start_date, end_date=end_date, user_id=user_id)
+        for term in keyword.split():
+            pattern = f'%{escape_like(term)}%'
+            query = query.filter(db.or_(like_condition(Task.title, pattern), like_condition(Task.description, pattern)))
+        rows = query.order_by(Task.date.desc(), Task.id.desc()).offset(offset).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+    
+    log_action('搜索任务', f'关键词: {keyword}')
+    
+    return jsonify({
+        'query': keyword,
+        'page': page,
+        'limit': limit,
+        'has_more': has_more,
+        'tasks': serialize_task_rows(rows)
+    })
+
+@app.route('/api/tasks/changes')
+@login_required
+def get_task_changes():
+    """增量同步：返回 since 版本之后的任务变更
+    
+    同一任务的多次变更只返回最后一次；删除的任务以 {'task_id', 'action': 'delete'} 返回。
+    since 早于已清理的变更日志或变更数超过上限时返回 reset=true，客户端需全量重新加载。
+    """
+    try:
+        since = int(request.args.get('since', ''))
+    except ValueError:
+        return jsonify({'error': 'since 参数不正确'}), 400
+    
+    version = current_task_version()
+    oldest = db.session.query(db.func.min(TaskChange.id)).scalar()
+    if since > version or (oldest is not None and since < oldest - 1):
+        return jsonify({'version': version, 'reset': True, 'changes': []})
+    
+    query = db.session.query(TaskChange.id, TaskChange.task_id, TaskChange.action).filter(
+        TaskChange.id > since, TaskChange.id <= version
+    )
+    if current_user.role != 'manager':
+        query = query.filter(TaskChange.user_id == current_user.id)
+    limit = app.config['TASK_CHANGES_MAX']
+    rows = query.order_by(TaskChange.id).limit(limit + 1).all()
+    if len(rows) > limit:
+        return jsonify({'version': version, 'reset': True, 'changes': []})
+    
+    latest = {}
+    for row in rows:
+        latest[row.task_id] = row.action
+    upsert_ids = [task_id for task_id, action in latest.items() if action == 'upsert']
+    current = {}
+    if upsert_ids:
+        for task in serialize_task_rows(task_list_query().filter(Task.id.in_(upsert_ids)).all()):
+            current[task['id']] = task
+    
+    changes = []
+    for task_id in latest:
+        if task_id in current:
+            changes.append({'task_id': task_id, 'action': 'upsert', 'task': current[task_id]})
+        else:
+            changes.append({'task_id': task_id, 'action': 'delete'})
+    
+    return jsonify({'version': version, 'reset': False, 'changes': changes})
+
+def months_between(start, end):
+    """返回日期范围覆盖的所有月份（YYYY-MM）"""
+    months = []
+    current = date(start.year, start.month, 1)
+    while current <= end:
+        months.append(current.strftime('%Y-%m'))
+        current = date(current.year + current.month // 12, current.month % 12 + 1, 1)
+    return months
+
+@app.route('/api/calendar/<month>')
+@login_required
+def get_calendar_month(month):
+    """按月获取日历显示窗口内的任务，按日期分组
+    
+    响应带有由相关月份版本号计算的ETag，客户端带 If-None-Match 请求且数据未变化时返回304。
+    """
+    try:
+        window_start, window_end = calendar_window(month)
+    except ValueError:
+        return jsonify({'error': '月份格式不正确'}), 400
+    
+    months = months_between(window_start, window_end)
+    versions = dict(db.session.query(TaskMonthVersion.month, TaskMonthVersion.version).filter(
+        TaskMonthVersion.month.in_(months)
+    ).all())
+    
+    # 领导看到全部任务，职员只看到自己的任务，ETag 需要区分
+    scope = 'all' if current_user.role == 'manager' else f'user{current_user.id}'
+    version_key = '.'.join(str(versions.get(m, 0)) for m in months)
+    etag = hashlib.sha1(f'{scope}|{month}|{version_key}'.encode()).hexdigest()[:20]
+    
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+        response.set_etag(etag)
+        return response
+    
+    version = current_task_version()
+    query = filter_task_query(
+        task_list_query(),
+        start_date=window_start,
+        end_date=window_end,
+        user_id=None if current_user.role == 'manager' else current_user.id
+    ).order_by(Task.date, Task.id)
+    
+    days = {}
+    for task in serialize_task_rows(query.all()):
+        days.setdefault(task['date'], []).append(task)
+    
+    response = jsonify({
+        'month': month,
+        'start_date': window_start.isoformat(),
+        'end_date': window_end.isoformat(),
+        'version': version,
+        'days': days
+    })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def stats_period(day, granularity):
+    """把日期归入统计周期：day 为当天，week 为所在周的周一，month 为 YYYY-MM"""
+    if granularity == 'month':
+        return day.strftime('%Y-%m')
+    if granularity == 'week':
+        return (day - timedelta(days=day.weekday())).isoformat()
+    return day.isoformat()
+
+def default_stats_start(granularity, today):
+    """未指定开始日期时的默认统计范围"""
+    if granularity == 'month':
+        month_index = today.year * 12 + today.month - 1 - 11
+        return date(month_index // 12, month_index % 12 + 1, 1)
+    if granularity == 'week':
+        return today - timedelta(days=today.weekday() + 7 * 11)
+    return today - timedelta(days=30)
+
+@app.route('/api/stats')
+@login_required
+def get_stats():
+    """按月/周/日统计每个员工的任务数（读取日统计汇总表）
+    
+    查询参数：granularity（month/week/day，默认day）、start_date、end_date、
+    user_id（仅领导）、by_user（默认1，为0时合并所有员工）。
+    """
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in ('month', 'week', 'day'):
+        return jsonify({'error': '不支持的统计粒度'}), 400
+    
+    try:
+        start_date = parse_date_arg('start_date')
+        end_date = parse_date_arg('end_date')
+    except ValueError:
+        return jsonify({'error': '日期格式不正确'}), 400
+    
+    today = datetime.now().date()
+    start_date = start_date or default_stats_start(granularity, today)
+    end_date = end_date or today
+    by_user = request.args.get('by_user', '1') != '0'
+    
+    if current_user.role == 'manager':
+        user_id = request.args.get('user_id', type=int)
+    else:
+        user_id = current_user.id
+    
+    query = db.session.query(
+        TaskDailyStat.date,
+        TaskDailyStat.user_id,
+        User.name,
+        TaskDailyStat.high_count,
+        TaskDailyStat.medium_count,
+        TaskDailyStat.low_count,
+        TaskDailyStat.total_count
+    ).join(User, TaskDailyStat.user_id == User.id).filter(
+        TaskDailyStat.date >= start_date,
+        TaskDailyStat.date <= end_date
+    )
+    if user_id:
+        query = query.filter(TaskDailyStat.user_id == user_id)
+    
+    buckets = {}
+    for day, row_user_id, user_name, high, medium, low, total in query:
+        period = stats_period(day, granularity)
+        key = (period, row_user_id) if by_user else (period, None)
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = {'period': period, 'high': 0, 'medium': 0, 'low': 0, 'total': 0}
+            if by_user:
+                bucket['user_id'] = row_user_id
+                bucket['user_name'] = user_name
+        bucket['high'] += high
+        bucket['medium'] += medium
+        bucket['low'] += low
+        bucket['total'] += total
+    
+    stats = sorted(buckets.values(), key=lambda item: (item['period'], item.get('user_name') or ''))
+    
+    return jsonify({
+        'granularity': granularity,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'stats': stats
+    })
+
+def escape_like(value):
+    """转义 LIKE 通配符"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def like_condition(column, pattern):
+    """不区分大小写的 LIKE（SQLite 的 LIKE 本身不区分大小写，其他数据库使用 ILIKE）"""
+    if DATABASE_BACKEND == 'sqlite':
+        return column.like(pattern, escape='\\')
+    return column.ilike(pattern, escape='\\')
+
+def user_activity_summary(user_ids):
+    """一次分组查询汇总用户的任务数和最近任务日期（读取日统计汇总表）"""
+    if not user_ids:
+        return {}
+    rows = db.session.query(
+        TaskDailyStat.user_id,
+        db.func.sum(TaskDailyStat.total_count),
+        db.func.max(TaskDailyStat.date)
+    ).filter(TaskDailyStat.user_id.in_(user_ids)).group_by(TaskDailyStat.user_id).all()
+    return {user_id: (int(task_count or 0), last_date) for user_id, task_count, last_date in rows}
+
 @app.route('/api/users')
 @login_required
 def get_users():
+    """获取员工列表（仅领导）
+    
+    查询参数：q（按用户名或姓名搜索）、match（substring 默认，不区分大小写；或 prefix，区分大小写，可使用索引）、
+    with_stats=1（附带任务数和最近活动）、limit/cursor（按姓名和ID排序的游标分页）。
+    不带 limit 时返回用户数组，带 limit 时返回 {'users': [...], 'next_cursor': ..., 'total': ...}，
+    total 只在第一页返回。
+    """
     if current_user.role != 'manager':
         return jsonify({'error': '无权限'}), 403
     
-    users = User.query.filter_by(role='employee').all()
-    user_list = []
-    for user in users:
-        user_list.append({
-            'id': user.id,
-            'name': user.name,
-            'username': user.username
-        })
-    
-    # 记录查看用户列表日志
-    log_action('查看用户列表', f'查看了 {len(users)} 个用户')
+    keyword = (request.args.get('q') or '').strip()
+    match = request.args.get('match', 'substring')
+    if match not in ('substring', 'prefix'):
+        return jsonify({'error': 'match 只能是 substring 或 prefix'}), 400
+    with_stats = request.args.get('with_stats') == '1'
+    try:
+        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor')
+        if cursor:
+            cursor_id, cursor_name = cursor.split('_', 1)
+            cursor_id = int(cursor_id)
+    except ValueError:
+        return jsonify({'error': '分页参数不正确'}), 400
+    
+    query = db.session.query(
+        User.id, User.name, User.username, User.last_login
+    ).filter(User.role == 'employee')
+    if keyword:
+        # prefix 与日志筛选相同，按范围比较以使用用户名唯一索引和 (role, name) 索引（区分大小写）
+        mode = 'prefix' if match == 'prefix' else 'contains'
+        query = query.filter(db.or_(
+            match_condition(User.username, keyword, mode),
+            match_condition(User.name, keyword, mode)
+        ))
+    
+    total = None
+    if limit is not None and not cursor:
+        total = query.order_by(None).count()
+    if cursor:
+        query = query.filter(db.or_(
+            User.name > cursor_name,
+            db.and_(User.name == cursor_name, User.id > cursor_id)
+        ))
+    query = query.order_by(User.name, User.id)
+    
+    has_more = False
+    if limit is not None:
+        limit = max(1, min(limit, app.config['USERS_MAX_PAGE_SIZE']))
+        rows = query.limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+    else:
+        rows = query.all()
     
-    return jsonify(user_list)
+    summary = user_activity_summary([row.id for row in rows]) if with_stats else {}
+    user_list = []
+    for row in rows:
+        item = {
+            'id': row.id,
+            'name': row.name,
+            'username': row.username
+        }
+        if with_stats:
+            task_count, last_task_date = summary.get(row.id, (0, None))
+            item['task_count'] = task_count
+            item['last_task_date'] = last_task_date.isoformat() if last_task_date else None
+            item['last_login'] = row.last_login.isoformat() if row.last_login else None
+        user_list.append(item)
+    
+    if limit is None:
+        return jsonify(user_list)
+    return jsonify({
+        'users': user_list,
+        'next_cursor': f'{rows[-1].id}_{rows[-1].name}' if has_more else None,
+        'total': total
+    })
 
 @app.route('/api/logs')
 @login_required
 def get_logs():
+    """获取操作日志（仅领导）
+    
+    查询参数：user_id、action、match（exact 默认 / prefix / contains）、start_date/end_date、
+    per_page、cursor（按时间倒序的游标分页）、total（approx 估算 / exact 精确，不传则不计算，只统计在线表）、
+    archive（默认1，在线记录翻完后继续读取归档月份；0 只查在线表）。
+    """
     if current_user.role != 'manager':
         return jsonify({'error': '无权限'}), 403
     
     # 获取查询参数
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 50, type=int)
+    try:
+        per_page, cursor, match, total_mode, include_archive = parse_audit_args()
+        start_date = parse_date_arg('start_date')
+        end_date = parse_date_arg('end_date')
+    except ValueError:
+        return jsonify({'error': '参数格式不正确'}), 400
     user_id = request.args.get('user_id', type=int)
     action = request.args.get('action', '')
-    start_date = request.args.get('start_date', '')
-    end_date = request.args.get('end_date', '')
-    
-    # 构建查询
-    query = Log.query
+    start = datetime.combine(start_date, datetime.min.time()) if start_date else None
+    end = datetime.combine(end_date + timedelta(days=1), datetime.min.time()) if end_date else None
     
+    # 构建筛选条件
+    conditions = []
     if user_id:
-        query = query.filter(Log.user_id == user_id)
+        conditions.append(Log.user_id == user_id)
     if action:
-        query = query.filter(Log.action.contains(action))
-    if start_date:
-        query = query.filter(Log.created_at >= datetime.strptime(start_date, '%Y-%m-%d'))
-    if end_date:
-        query = query.filter(Log.created_at <= datetime.strptime(end_date + ' 23:59:59', '%Y-%m-%d %H:%M:%S'))
+        conditions.append(match_condition(Log.action, action, match))
+    if start:
+        conditions.append(Log.created_at >= start)
+    if end:
+        conditions.append(Log.created_at < end)
     
-    # 按时间倒序排列
-    query = query.order_by(Log.created_at.desc())
-    
-    # 分页
-    logs = query.paginate(page=page, per_page=per_page, error_out=False)
+    total, total_exact = audit_total(Log, conditions, total_mode)
+    logs, next_cursor = audit_page(Log, conditions, cursor, per_page, include_archive, start=start, end=end)
     
     log_list = []
-    for log in logs.items:
+    for log in logs:
         log_list.append({
             'id': log.id,
             'user_name': log.user_name,
@@ -915,11 +1916,135 @@ def get_logs():
     
     return jsonify({
         'logs': log_list,
-        'total': logs.total,
-        'pages': logs.pages,
-        'current_page': page
+        'next_cursor': next_cursor,
+        'total': total,
+        'total_exact': total_exact
     })
 
+EXPORT_CSV_HEADER = ['员工姓名', '任务标题', '任务描述', '日期', '优先级', '状态', '创建时间']
+
+# 列式导出的列定义，与 export_task_query 的投影顺序一致
+EXPORT_COLUMNS = [
+    ('user_name', 'string'),
+    ('title', 'string'),
+    ('description', 'string'),
+    ('date', 'date'),
+    ('priority', 'string'),
+    ('status', 'string'),
+    ('created_at', 'timestamp')
+]
+
+# 导出格式：format 参数值 -> (Content-Type, 文件扩展名)
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8-sig', 'csv'),
+    'csv.gz': ('application/gzip', 'csv.gz'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows')
+}
+
+def export_task_query(start_date=None, end_date=None):
+    """导出用的任务查询：JOIN取员工姓名，只投影导出的列，按日期顺序流式读取"""
+    query = db.session.query(
+        User.name,
+        Task.title,
+        Task.description,
+        Task.date,
+        Task.priority,
+        Task.status,
+        Task.created_at
+    ).join(User, Task.user_id == User.id)
+    query = filter_task_query(query, start_date=start_date, end_date=end_date)
+    return query.order_by(Task.date, Task.id).yield_per(app.config['EXPORT_FETCH_SIZE'])
+
+def generate_task_csv(rows):
+    """逐行写CSV，缓冲区达到 EXPORT_CHUNK_BYTES 时输出一块"""
+    chunk_bytes = app.config['EXPORT_CHUNK_BYTES']
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_CSV_HEADER)
+    
+    count = 0
+    for user_name, title, description, task_date, priority, status, created_at in rows:
+        writer.writerow([
+            user_name,
+            title,
+            description or '',
+            task_date.strftime('%Y-%m-%d'),
+            get_priority_text(priority),
+            get_status_text(status),
+            created_at.strftime('%Y-%m-%d %H:%M:%S') if created_at else ''
+        ])
+        count += 1
+        if buffer.tell() >= chunk_bytes:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    
+    yield buffer.getvalue()
+    
+    # 记录导出CSV日志（全部输出完成后才知道条数）
+    log_action('导出CSV', f'导出了 {count} 个任务数据')
+
+def generate_task_columnar(rows, export_format):
+    """按批输出 Parquet / Arrow 格式的任务数据"""
+    counter = [0]
+    
+    def counted(rows):
+        for row in rows:
+            counter[0] += 1
+            yield row
+    
+    yield from columnar_chunks(counted(rows), EXPORT_COLUMNS, export_format,
+                               batch_rows=app.config['EXPORT_COLUMNAR_BATCH_ROWS'])
+    
+    log_action('导出数据', f'以 {export_format} 格式导出了 {counter[0]} 个任务数据')
+
+def negotiate_export_format():
+    """优先使用 format 参数，其次根据 Accept 请求头选择导出格式"""
+    export_format = request.args.get('format')
+    if export_format:
+        return export_format
+    
+    mimetypes = {EXPORT_FORMATS[name][0].split(';')[0]: name for name in EXPORT_FORMATS}
+    best = request.accept_mimetypes.best_match(list(mimetypes), default='text/csv')
+    return mimetypes.get(best, 'csv')
+
+@app.route('/api/events')
+@login_required
+def event_stream():
+    """SSE 实时推送：任务增删改（职员只收到自己的任务），领导另外收到新的安全事件
+    
+    事件类型：task、security；订阅队列溢出时发送 reset，客户端需重新同步。
+    """
+    is_manager = current_user.role == 'manager'
+    user_id = current_user.id
+    channels = ['tasks', 'security'] if is_manager else ['tasks']
+    subscription = event_bus.subscribe(channels)
+    heartbeat = app.config['SSE_HEARTBEAT']
+    
+    def generate():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                event = subscription.get(timeout=heartbeat)
+                if subscription.overflowed:
+                    subscription.overflowed = False
+                    yield 'event: reset\ndata: {}\n\n'
+                if event is None:
+                    yield ': keep-alive\n\n'
+                    continue
+                if event.channel == 'tasks' and not is_manager and event.data['user_id'] != user_id:
+                    continue
+                event_name = 'task' if event.channel == 'tasks' else event.channel
+                yield f"event: {event_name}\ndata: {json.dumps(event.data, ensure_ascii=False)}\n\n"
+        finally:
+            subscription.close()
+    
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # 关闭 nginx 缓冲
+    return response
+
 @app.route('/api/export-csv')
 @login_required
 def export_csv():
@@ -927,46 +2052,32 @@ def export_csv():
         return jsonify({'error': '无权限'}), 403
     
     # 获取查询参数
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    
-    # 查询任务
-    query = Task.query.join(User)
-    
-    if start_date:
-        query = query.filter(Task.date >= datetime.strptime(start_date, '%Y-%m-%d').date())
-    if end_date:
-        query = query.filter(Task.date <= datetime.strptime(end_date, '%Y-%m-%d').date())
-    
-    tasks = query.all()
-    
-    # 创建CSV数据
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # 写入表头
-    writer.writerow(['员工姓名', '任务标题', '任务描述', '日期', '优先级', '状态', '创建时间'])
-    
-    # 写入数据
-    for task in tasks:
-        writer.writerow([
-            task.user.name,
-            task.title,
-            task.description or '',
-            task.date.strftime('%Y-%m-%d'),
-            get_priority_text(task.priority),
-            get_status_text(task.status),
-            task.created_at.strftime('%Y-%m-%d %H:%M:%S')
-        ])
-    
-    # 记录导出CSV日志
-    log_action('导出CSV', f'导出了 {len(tasks)} 个任务数据')
+    try:
+        start_date = parse_date_arg('start_date')
+        end_date = parse_date_arg('end_date')
+    except ValueError:
+        return jsonify({'error': '日期格式不正确'}), 400
+    
+    export_format = negotiate_export_format()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': '不支持的导出格式'}), 400
+    if export_format in COLUMNAR_FORMATS and not columnar_available():
+        return jsonify({'error': '服务器未安装 pyarrow，无法导出列式格式'}), 406
+    
+    rows = export_task_query(start_date, end_date)
+    
+    if export_format in COLUMNAR_FORMATS:
+        body = generate_task_columnar(rows, export_format)
+    elif export_format == 'csv.gz':
+        body = gzip_chunks(generate_task_csv(rows))
+    else:
+        body = generate_task_csv(rows)
     
-    # 创建响应
-    output.seek(0)
-    response = make_response(output.getvalue())
-    response.headers['Content-Type'] = 'text/csv; charset=utf-8-sig'
-    response.headers['Content-Disposition'] = f'attachment; filename=tasks_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+    # 流式响应：边查询边输出，内存占用与导出范围无关
+    content_type, extension = EXPORT_FORMATS[export_format]
+    response = Response(stream_with_context(body), mimetype=content_type)
+    response.headers['Content-Type'] = content_type
+    response.headers['Content-Disposition'] = f'attachment; filename=tasks_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
     
     return response
 
@@ -985,105 +2096,20 @@ def get_status_text(status):
     return texts.get(status, status)
 
 if __name__ == '__main__':
+    from seed_data import print_summary, seed_database
+    
     with app.app_context():
         db.create_all()
+        upgrade_schema(db.engine, db.metadata)
         
-        # 检查是否需要初始化数据
+        # 检查是否需要初始化数据（更大规模的数据用 python seed_data.py 生成）
         if not User.query.filter_by(username='admin').first():
             print("初始化数据库...")
-            
-            # 创建管理员账户
-            admin = User(
-                username='admin',
-                password_hash=generate_password_hash('admin123'),
-                name='系统管理员',
-                role='manager'
-            )
-            db.session.add(admin)
-            
-            # 创建25个员工账户
-            employees = []
-            for i in range(1, 26):
-                employee = User(
-                    username=f'employee{i:02d}',
-                    password_hash=generate_password_hash('123456'),
-                    name=f'员工{i:02d}',
-                    role='employee'
-                )
-                employees.append(employee)
-                db.session.add(employee)
-            
-            db.session.commit()
-            print(f"已创建管理员和 {len(employees)} 个员工账户")
-            
-            # 为员工生成测试任务数据
-            print("生成测试任务数据...")
-            task_titles = [
-                '完成项目报告', '客户会议', '代码审查', '系统测试', '文档编写',
-                '数据分析', '产品设计', '市场调研', '培训课程', '会议准备',
-                '问题排查', '性能优化', '安全检查', '备份维护', '用户支持',
-                '需求分析', '原型设计', '测试用例', '部署上线', '监控维护'
-            ]
-            
-            task_descriptions = [
-                '完成本周的项目进度报告，包括完成情况和下周计划',
-                '与客户进行项目进度沟通，了解需求和反馈',
-                '对团队成员的代码进行审查，确保代码质量',
-                '对系统进行全面测试，发现并修复问题',
-                '编写技术文档和用户手册',
-                '分析用户数据，生成分析报告',
-                '设计新产品功能，制定设计方案',
-                '进行市场调研，了解竞争对手情况',
-                '准备培训材料，进行员工培训',
-                '准备会议材料，安排会议议程',
-                '排查系统问题，找出根本原因',
-                '优化系统性能，提升用户体验',
-                '进行安全检查，确保系统安全',
-                '定期备份数据，确保数据安全',
-                '处理用户反馈，提供技术支持',
-                '分析用户需求，制定解决方案',
-                '设计产品原型，验证功能可行性',
-                '编写测试用例，确保功能正确性',
-                '部署新版本，确保系统稳定',
-                '监控系统运行状态，及时处理异常'
-            ]
-            
-            priorities = ['low', 'medium', 'high']
-            
-            # 为每个员工生成过去30天的任务
-            for employee in employees:
-                # 每个员工随机生成15-25个任务
-                num_tasks = random.randint(15, 25)
-                
-                for _ in range(num_tasks):
-                    # 随机选择过去30天内的日期
-                    days_ago = random.randint(0, 30)
-                    task_date = date.today() - timedelta(days=days_ago)
-                    
-                    # 随机选择任务信息
-                    title = random.choice(task_titles)
-                    description = random.choice(task_descriptions)
-                    priority = random.choice(priorities)
-                    
-                    task = Task(
-                        title=title,
-                        description=description,
-                        date=task_date,
-                        status='in_progress',
-                        priority=priority,
-                        user_id=employee.id
-                    )
-                    db.session.add(task)
-            
-            db.session.commit()
-            
-            total_users = User.query.count()
-            total_tasks = Task.query.count()
-            print(f"数据初始化完成！")
-            print(f"总用户数: {total_users}")
-            print(f"总任务数: {total_tasks}")
-            print(f"管理员账户: admin / admin123")
-            print(f"员工账户示例: employee01 / 123456")
+            seed_database(db.engine, db.metadata, password_hasher.hash_many)
+            rebuild_task_daily_stats()
+            rebuild_task_search_index()
+            print("数据初始化完成！")
+            print_summary(db.engine, db.metadata)
         else:
             print("数据库已存在，跳过初始化")
     
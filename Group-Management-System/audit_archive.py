@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+审计日志保留与归档
+超过保留天数的 log / security_event 记录按月写入归档文件后，再分批从在线表中删除。
+归档文件是与在线表结构相同的 SQLite 数据库，gzip 压缩保存为 <目录>/<表名>/<YYYY-MM>.sqlite.gz；
+查询时解压到缓存目录并以只读方式打开，日志接口翻页到在线数据末尾后可继续读取归档月份。
+
+每次归档时，超过保留期的记录都比在线表中剩余的记录更早，
+因此按时间倒序翻页时，归档数据可以直接接在在线数据之后。
+
+用法:
+    python audit_archive.py                 # 执行一次归档
+    python audit_archive.py --dry-run       # 只统计将要归档的记录数
+    python audit_archive.py --status        # 查看在线表和归档文件状态
+    python audit_archive.py --loop 86400    # 定时模式：每隔指定秒数执行一次
+"""
+
+import argparse
+import glob
+import gzip
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, select, text, tuple_
+
+
+def month_key(moment):
+    return moment.strftime('%Y-%m')
+
+
+def month_bounds(month):
+    """返回月份的 [开始, 下月开始)"""
+    start = datetime.strptime(month, '%Y-%m')
+    if start.month == 12:
+        end = start.replace(year=start.year + 1, month=1)
+    else:
+        end = start.replace(month=start.month + 1)
+    return start, end
+
+
+class AuditArchive:
+    """按月归档的审计表存储"""
+
+    def __init__(self, directory, batch_size=5000):
+        self.directory = directory
+        self.cache_directory = os.path.join(directory, '.cache')
+        self.batch_size = batch_size
+        self._engines = {}
+        self._lock = threading.Lock()
+
+    def archive_path(self, table_name, month):
+        return os.path.join(self.directory, table_name, f'{month}.sqlite.gz')
+
+    def months(self, table_name):
+        """已归档的月份（升序）"""
+        paths = glob.glob(os.path.join(self.directory, table_name, '*.sqlite.gz'))
+        return sorted(os.path.basename(path)[:-len('.sqlite.gz')] for path in paths)
+
+    # ---- 写入 ----
+
+    def archive_table(self, engine, table, cutoff, dry_run=False, log=print):
+        """把 created_at 早于 cutoff 的记录按月归档并从在线表删除，返回 {月份: 记录数}"""
+        created_at = table.c.created_at
+        with engine.connect() as conn:
+            oldest = conn.execute(select(func.min(created_at))).scalar()
+        if oldest is None or oldest >= cutoff:
+            return {}
+
+        archived = {}
+        month = month_key(oldest)
+        while True:
+            month_start, month_end = month_bounds(month)
+            if month_start >= cutoff:
+                break
+            range_end = min(month_end, cutoff)
+            condition = (created_at >= month_start) & (created_at < range_end)
+
+            if dry_run:
+                with engine.connect() as conn:
+                    count = conn.execute(select(func.count()).select_from(table).where(condition)).scalar()
+            else:
+                count, max_id = self._write_month(engine, table, month, condition)
+                if count:
+                    self._delete_archived(engine, table, condition, max_id)
+            if count:
+                archived[month] = count
+                log(f"{table.name} {month}: {'将归档' if dry_run else '已归档'} {count} 条")
+            month = month_key(month_end)
+        return archived
+
+    def _write_month(self, engine, table, month, condition):
+        """把在线表中某月的记录追加到归档文件，返回 (记录数, 最大ID)"""
+        os.makedirs(os.path.join(self.directory, table.name), exist_ok=True)
+        os.makedirs(self.cache_directory, exist_ok=True)
+        path = self.archive_path(table.name, month)
+        building = os.path.join(self.cache_directory, f'{table.name}-{month}.building.sqlite')
+
+        if os.path.exists(path):
+            with gzip.open(path, 'rb') as source, open(building, 'wb') as target:
+                shutil.copyfileobj(source, target)
+        elif os.path.exists(building):
+            os.remove(building)
+
+        archive_engine = create_engine(f'sqlite:///{building}')
+        count = 0
+        max_id = None
+        try:
+            table.create(archive_engine, checkfirst=True)
+            last_id = 0
+            while True:
+                with engine.connect() as conn:
+                    rows = conn.execute(
+                        select(table).where(condition, table.c.id > last_id)
+                        .order_by(table.c.id).limit(self.batch_size)
+                    ).mappings().all()
+                if not rows:
+                    break
+                # 重复执行时已归档的记录按主键跳过
+                with archive_engine.begin() as archive_conn:
+                    archive_conn.execute(table.insert().prefix_with('OR IGNORE'), [dict(row) for row in rows])
+                last_id = max_id = rows[-1]['id']
+                count += len(rows)
+
+            if count:
+                with archive_engine.connect() as archive_conn:
+                    archive_conn.exec_driver_sql('VACUUM')
+        finally:
+            archive_engine.dispose()
+
+        if count:
+            # 先写临时文件再替换，中途失败不会损坏已有归档
+            partial = path + '.partial'
+            with open(building, 'rb') as source, gzip.open(partial, 'wb') as target:
+                shutil.copyfileobj(source, target)
+                target.flush()
+                os.fsync(target.fileno())
+            os.replace(partial, path)
+            self._forget(path)
+        os.remove(building)
+        return count, max_id
+
+    def _delete_archived(self, engine, table, condition, max_id):
+        """分批删除已归档的记录，每批一个短事务"""
+        while True:
+            with engine.begin() as conn:
+                ids = conn.execute(
+                    select(table.c.id).where(condition, table.c.id <= max_id).limit(self.batch_size)
+                ).scalars().all()
+                if not ids:
+                    return
+                conn.execute(table.delete().where(table.c.id.in_(ids)))
+
+    # ---- 只读查询 ----
+
+    def _open(self, table_name, month):
+        """解压归档到缓存目录（归档更新后重新解压），返回只读连接的 Engine"""
+        path = self.archive_path(table_name, month)
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            cached = self._engines.get(path)
+            if cached and cached[0] == mtime:
+                return cached[1]
+
+            os.makedirs(self.cache_directory, exist_ok=True)
+            plain = os.path.join(self.cache_directory, f'{table_name}-{month}.sqlite')
+            partial = plain + '.partial'
+            with gzip.open(path, 'rb') as source, open(partial, 'wb') as target:
+                shutil.copyfileobj(source, target)
+            os.replace(partial, plain)
+
+            if cached:
+                cached[1].dispose()
+            engine = create_engine(f'sqlite:///file:{plain}?mode=ro&uri=true')
+            self._engines[path] = (mtime, engine)
+            return engine
+
+    def _forget(self, path):
+        with self._lock:
+            cached = self._engines.pop(path, None)
+        if cached:
+            cached[1].dispose()
+
+    def read_page(self, table, conditions, cursor, limit, start=None, end=None):
+        """按 (created_at, id) 倒序从归档中读取最多 limit 条记录
+
+        conditions 为与在线查询相同的筛选条件；cursor 为 (created_at, id) 或 None；
+        start/end 为时间范围，用于跳过不相关的月份。
+        """
+        rows = []
+        for month in reversed(self.months(table.name)):
+            month_start, month_end = month_bounds(month)
+            if (end and month_start >= end) or (start and month_end <= start):
+                continue
+            if cursor and month_start > cursor[0]:
+                continue
+
+            statement = select(table).where(*conditions)
+            if cursor:
+                statement = statement.where(tuple_(table.c.created_at, table.c.id) < cursor)
+            statement = statement.order_by(table.c.created_at.desc(), table.c.id.desc()).limit(limit - len(rows))
+            with self._open(table.name, month).connect() as conn:
+                rows.extend(conn.execute(statement).all())
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def status(self, table_name):
+        """返回 [(月份, 压缩后字节数)]"""
+        return [(month, os.path.getsize(self.archive_path(table_name, month))) for month in self.months(table_name)]
+
+
+def run_retention(archive, engine, tables, retention_days, dry_run=False, vacuum=False, now=None, log=print):
+    """按各表的保留天数执行一次归档，返回 {表名: {月份: 记录数}}"""
+    now = now or datetime.utcnow()
+    result = {}
+    for table in tables:
+        days = retention_days.get(table.name)
+        if not days:
+            continue
+        cutoff = now - timedelta(days=days)
+        result[table.name] = archive.archive_table(engine, table, cutoff, dry_run=dry_run, log=log)
+
+    if vacuum and not dry_run and any(result.values()) and engine.dialect.name == 'sqlite':
+        # 删除后 SQLite 文件不会自动变小，VACUUM 回收空间（期间会锁库）
+        with engine.connect() as conn:
+            conn.execute(text('VACUUM'))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='审计日志保留与归档')
+    parser.add_argument('--dry-run', action='store_true', help='只统计将要归档的记录数，不做修改')
+    parser.add_argument('--status', action='store_true', help='查看在线表和归档文件状态')
+    parser.add_argument('--vacuum', action='store_true', help='归档后执行 VACUUM 回收数据库文件空间')
+    parser.add_argument('--loop', type=int, metavar='SECONDS', help='定时模式：每隔指定秒数执行一次')
+    args = parser.parse_args()
+
+    from app import app, db, Log, SecurityEvent, audit_archive
+
+    tables = [Log.__table__, SecurityEvent.__table__]
+    with app.app_context():
+        if args.status:
+            with db.engine.connect() as conn:
+                for table in tables:
+                    count, oldest = conn.execute(select(func.count(), func.min(table.c.created_at)).select_from(table)).one()
+                    days = app.config['AUDIT_RETENTION_DAYS'].get(table.name)
+                    print(f"{table.name}: 在线 {count} 条，最早 {oldest or '-'}，保留 {days or '不限'} 天")
+                    for month, size in audit_archive.status(table.name):
+                        print(f"    归档 {month}: {size / 1024:.1f} KB")
+            return
+
+        while True:
+            result = run_retention(
+                audit_archive, db.engine, tables, app.config['AUDIT_RETENTION_DAYS'],
+                dry_run=args.dry_run, vacuum=args.vacuum
+            )
+            if not any(result.values()):
+                print(f"{datetime.now():%Y-%m-%d %H:%M:%S} 没有需要归档的记录")
+            if not args.loop:
+                return
+            time.sleep(args.loop)
+
+
+if __name__ == '__main__':
+    main()
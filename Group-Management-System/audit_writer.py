@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+异步审计日志写入模块
+请求线程只把日志行放入有界队列，由后台线程按批次写入数据库，
+请求延迟中不再包含审计日志的提交和 fsync。
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+
+# 队列满时的处理策略
+POLICY_BLOCK = 'block'  # 阻塞等待（背压），超时后丢弃
+POLICY_DROP = 'drop'  # 立即丢弃
+
+_STOP = object()
+
+
+class AuditLogWriter:
+    """批量审计日志写入器
+
+    write_batch(table, rows) 负责在一个事务中写入同一张表的多行
+    （通常是一条 executemany 语句）。
+    """
+
+    def __init__(self, write_batch, flush_interval=1.0, batch_size=500,
+                 queue_size=10000, policy=POLICY_BLOCK, put_timeout=0.5, enabled=True):
+        if policy not in (POLICY_BLOCK, POLICY_DROP):
+            raise ValueError(f'未知的队列策略: {policy}')
+
+        self._write_batch = write_batch
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.policy = policy
+        self.put_timeout = put_timeout
+        self.enabled = enabled
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self.dropped = 0
+        self.written = 0
+
+        atexit.register(self.close)
+
+    def submit(self, table, row):
+        """提交一行日志；未启用异步时直接同步写入"""
+        if not self.enabled:
+            self._write([(table, row)])
+            return True
+
+        self._ensure_started()
+        try:
+            if self.policy == POLICY_BLOCK:
+                self._queue.put((table, row), timeout=self.put_timeout)
+            else:
+                self._queue.put_nowait((table, row))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                print(f"审计日志队列已满，已丢弃 {self.dropped} 条日志")
+            return False
+
+    def _ensure_started(self):
+        """惰性启动后台线程（fork 出的子进程中会重新启动）"""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = []
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+
+            # 攒够一批或到达刷新间隔后写入
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            if batch:
+                self._write(batch)
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                self._queue.task_done()
+                return
+
+    def _write(self, batch):
+        """按表分组后批量写入"""
+        rows_by_table = {}
+        for table, row in batch:
+            rows_by_table.setdefault(table, []).append(row)
+
+        for table, rows in rows_by_table.items():
+            self._write_rows(table, rows)
+
+    def _write_rows(self, table, rows):
+        """批量写入失败时对半拆分重试，只丢弃写不进去的行，其余行仍按批写入"""
+        try:
+            self._write_batch(table, rows)
+            self.written += len(rows)
+        except Exception as e:
+            if len(rows) == 1:
+                self.dropped += 1
+                print(f"日志记录失败，已丢弃: {e}")
+                return
+            middle = len(rows) // 2
+            self._write_rows(table, rows[:middle])
+            self._write_rows(table, rows[middle:])
+
+    def flush(self, timeout=None):
+        """等待队列中已提交的日志全部写入"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        if timeout is None:
+            self._queue.join()
+            return
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def close(self, timeout=10.0):
+        """停止后台线程，并在退出前写完剩余日志"""
+        thread = self._thread
+        if thread is None or not thread.is_alive() or self._pid != os.getpid():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        self._thread = None
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+自动登录令牌模块
+令牌格式: <用户ID>.<签发时间戳>.<密码指纹>.<HMAC签名>
+- 签名使用服务器密钥计算，伪造或篡改的令牌无需查询数据库即可拒绝
+- 密码指纹由密码哈希派生，修改密码后旧令牌自动失效
+- 验证通过的令牌在内存中缓存一段时间，重复验证不再查询用户
+- 登出时注销的令牌（只保存摘要）写入共享存储，各进程定期重新加载，令牌到期后清理
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import namedtuple
+
+TokenIdentity = namedtuple('TokenIdentity', ['user_id', 'username'])
+
+
+def load_or_create_secret(path):
+    """读取签名密钥文件，不存在时生成一个（保证重启后已签发的令牌仍然有效）"""
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            secret = f.read().strip()
+        if secret:
+            return secret
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    secret = secrets.token_hex(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        f.write(secret)
+    return secret
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def password_fingerprint(password_hash):
+    """由密码哈希派生的短指纹"""
+    return _b64(hashlib.sha256(password_hash.encode()).digest()[:9])
+
+
+class AutoLoginTokens:
+    """签发和验证自动登录令牌
+
+    user_loader(user_id) 返回 (username, password_hash, is_active) 或 None，
+    只在缓存未命中时调用。
+    load_revoked() 返回未过期的已注销令牌 [(摘要, 过期时间戳)]，save_revoked(摘要, 过期时间戳) 保存注销记录；
+    未提供时注销只在当前进程内生效。
+    """
+
+    def __init__(self, secret, user_loader, max_age=30 * 24 * 3600, cache_ttl=300, cache_size=10000,
+                 load_revoked=None, save_revoked=None, revocation_refresh=30):
+        self._secret = secret.encode() if isinstance(secret, str) else secret
+        self._user_loader = user_loader
+        self.max_age = max_age
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._load_revoked = load_revoked
+        self._save_revoked = save_revoked
+        self.revocation_refresh = revocation_refresh
+        self._cache = {}
+        self._revoked = {}
+        self._revoked_loaded_at = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def token_hash(token):
+        """注销记录中保存的令牌摘要"""
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def _is_revoked(self, token):
+        monotonic_now = time.monotonic()
+        if self._load_revoked is not None and (
+            self._revoked_loaded_at is None or monotonic_now - self._revoked_loaded_at >= self.revocation_refresh
+        ):
+            revoked = dict(self._load_revoked())
+            with self._lock:
+                self._revoked = revoked
+                self._revoked_loaded_at = monotonic_now
+        return self.token_hash(token) in self._revoked
+
+    def _sign(self, payload):
+        return _b64(hmac.new(self._secret, payload.encode(), hashlib.sha256).digest())
+
+    def issue(self, user_id, password_hash, now=None):
+        """为用户签发新令牌"""
+        issued = int(time.time() if now is None else now)
+        payload = f"{user_id}.{issued}.{password_fingerprint(password_hash)}"
+        return f"{payload}.{self._sign(payload)}"
+
+    def validate(self, token, now=None):
+        """验证令牌，有效时返回 TokenIdentity，否则返回 None"""
+        if not token:
+            return None
+        now = time.time() if now is None else now
+
+        # 1. 格式、签名和有效期检查（不访问数据库）
+        try:
+            user_id, issued, fingerprint, signature = token.split('.')
+            user_id = int(user_id)
+            issued = int(issued)
+        except ValueError:
+            return None
+        if not hmac.compare_digest(signature, self._sign(f"{user_id}.{issued}.{fingerprint}")):
+            return None
+        if now - issued >= self.max_age:
+            return None
+
+        # 2. 缓存命中直接返回
+        if self._is_revoked(token):
+            return None
+        monotonic_now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(token)
+            if cached and cached[0] > monotonic_now:
+                return cached[1]
+
+        # 3. 缓存未命中时查询用户，确认账户可用且密码未修改
+        user = self._user_loader(user_id)
+        if not user:
+            return None
+        username, password_hash, is_active = user
+        if not is_active or not hmac.compare_digest(fingerprint, password_fingerprint(password_hash)):
+            return None
+
+        identity = TokenIdentity(user_id, username)
+        with self._lock:
+            if len(self._cache) >= self.cache_size:
+                self._evict_expired(monotonic_now)
+            self._cache[token] = (monotonic_now + self.cache_ttl, identity)
+        return identity
+
+    def _evict_expired(self, monotonic_now):
+        expired = [key for key, (expires, _) in self._cache.items() if expires <= monotonic_now]
+        for key in expired:
+            del self._cache[key]
+        # 仍然已满时清空，避免缓存无限增长
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+
+    def revoke(self, token):
+        """注销令牌（登出时调用），在令牌到期前一直拒绝"""
+        if not token:
+            return
+        # 只记录本服务器签发的令牌
+        try:
+            user_id, issued, fingerprint, signature = token.split('.')
+            issued = int(issued)
+        except ValueError:
+            return
+        if not hmac.compare_digest(signature, self._sign(f"{user_id}.{issued}.{fingerprint}")):
+            return
+        expires = issued + self.max_age
+        now = time.time()
+        if expires <= now:
+            return
+
+        token_hash = self.token_hash(token)
+        if self._save_revoked is not None:
+            self._save_revoked(token_hash, expires)
+        with self._lock:
+            self._cache.pop(token, None)
+            # 重新加载前本进程先生效，同时清理已过期的记录
+            self._revoked = {key: value for key, value in self._revoked.items() if value > now}
+            self._revoked[token_hash] = expires
+
+    def invalidate_user(self, user_id):
+        """清除某个用户的缓存令牌（修改密码、禁用账户时调用）"""
+        with self._lock:
+            stale = [key for key, (_, identity) in self._cache.items() if identity.user_id == user_id]
+            for key in stale:
+                del self._cache[key]
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+HTTP 端到端性能基准
+按不同数据规模生成测试数据库，通过 Flask 测试客户端（或本地 WSGI 服务器）请求各接口，
+统计每个接口的 p50/p95/p99 延迟和吞吐量，结果写入 JSON 报告；
+指定基准报告时逐项对比，p95 延迟或吞吐量退化超过阈值时以非零状态退出。
+
+用法:
+    python benchmarks/bench_http.py --scales small,medium --output report.json
+    python benchmarks/bench_http.py --server --concurrency 8             # 通过本地 HTTP 服务器请求
+    python benchmarks/bench_http.py --baseline report.json --threshold 0.2
+    python benchmarks/bench_http.py --database-url postgresql://...      # 注意：会删除该库中的全部表
+"""
+
+import argparse
+import http.cookiejar
+import json
+import logging
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import date, datetime, timedelta
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REPORT_VERSION = 1
+
+# 各规模的数据量（任务分布在最近 days 天内，日志和安全事件同样）
+SCALES = {
+    'small': {'users': 25, 'tasks': 500, 'logs': 2000, 'security_events': 200, 'days': 30},
+    'medium': {'users': 200, 'tasks': 20000, 'logs': 50000, 'security_events': 5000, 'days': 90},
+    'large': {'users': 1000, 'tasks': 200000, 'logs': 500000, 'security_events': 50000, 'days': 365}
+}
+
+
+def build_endpoints(today):
+    """返回 [(名称, 身份, 方法, 路径, 预期状态码)]，身份为 anonymous / employee / manager"""
+    month = today.strftime('%Y-%m')
+    week_ago = (today - timedelta(days=7)).isoformat()
+    return [
+        ('login', 'anonymous', 'POST', '/login', 302),
+        ('tasks_employee', 'employee', 'GET', f'/api/tasks?month={month}', 200),
+        ('tasks_manager', 'manager', 'GET', f'/api/tasks?month={month}', 200),
+        ('tasks_manager_page', 'manager', 'GET', '/api/tasks?limit=50', 200),
+        ('export_csv', 'manager', 'GET', f'/api/export-csv?start_date={week_ago}&end_date={today.isoformat()}', 200),
+        ('logs', 'manager', 'GET', '/api/logs?per_page=50', 200),
+        ('security_events', 'manager', 'GET', '/api/security-events?per_page=50', 200)
+    ]
+
+
+# ---- 客户端 ----
+
+class TestClient:
+    """Flask 测试客户端（进程内调用，不经过网络）"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        # 流式响应（导出）需要读完才算请求结束
+        for _ in response.response:
+            pass
+        status = response.status_code
+        response.close()
+        return status
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpClient:
+    """通过本地 WSGI 服务器请求，带 Cookie，不跟随重定向"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect()
+        )
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with self.opener.open(req, timeout=60) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            error.read()
+            return error.code
+
+
+class LocalServer:
+    """在后台线程中运行多线程 WSGI 服务器"""
+
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+        # 不逐条打印请求日志
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.base_url = f'http://127.0.0.1:{self.server.server_port}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.thread.join()
+
+
+# ---- 统计 ----
+
+def percentile(sorted_values, p):
+    """最近秩法百分位"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, errors, elapsed):
+    values = sorted(latency * 1000 for latency in latencies)
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'p50_ms': round(percentile(values, 50), 3),
+        'p95_ms': round(percentile(values, 95), 3),
+        'p99_ms': round(percentile(values, 99), 3),
+        'mean_ms': round(statistics.fmean(values), 3),
+        'max_ms': round(values[-1], 3),
+        'throughput_rps': round(len(values) / elapsed, 2) if elapsed else None
+    }
+
+
+def run_endpoint(make_client, credentials, endpoint, requests, concurrency, warmup):
+    """并发请求一个接口，返回统计结果"""
+    name, identity, method, path, expected = endpoint
+    if identity == 'anonymous':
+        # 登录接口每次使用新的客户端（未登录状态），表单为员工账户
+        form = credentials['employee']
+        new_client = make_client
+    else:
+        form = None
+
+        def new_client():
+            client = make_client()
+            status = client.request('POST', '/login', credentials[identity])
+            if status != 302:
+                raise RuntimeError(f'{identity} 登录失败（状态码 {status}）')
+            return client
+
+    def call(client):
+        if identity == 'anonymous':
+            client = new_client()
+        start = time.perf_counter()
+        status = client.request(method, path, form)
+        return time.perf_counter() - start, status == expected
+
+    # 每个线程一个已登录的客户端
+    clients = [new_client() for _ in range(concurrency)]
+    for i in range(warmup):
+        call(clients[i % concurrency])
+
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker(client):
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    return
+            latency, ok = call(client)
+            with lock:
+                latencies.append(latency)
+                if not ok:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=worker, args=(client,)) for client in clients]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return summarize(latencies, errors[0], elapsed)
+
+
+# ---- 基准对比 ----
+
+def compare(report, baseline, threshold):
+    """逐项对比 p95 延迟和吞吐量，返回 [(规模, 接口, 指标, 基准值, 当前值, 变化比例, 是否退化)]"""
+    rows = []
+    for scale, result in report['scales'].items():
+        base_scale = baseline.get('scales', {}).get(scale)
+        if not base_scale:
+            continue
+        for name, current in result['endpoints'].items():
+            base = base_scale['endpoints'].get(name)
+            if not base:
+                continue
+            if base.get('p95_ms') and current.get('p95_ms') is not None:
+                change = current['p95_ms'] / base['p95_ms'] - 1
+                rows.append((scale, name, 'p95_ms', base['p95_ms'], current['p95_ms'], change, change > threshold))
+            if base.get('throughput_rps') and current.get('throughput_rps') is not None:
+                change = current['throughput_rps'] / base['throughput_rps'] - 1
+                rows.append((scale, name, 'throughput_rps', base['throughput_rps'], current['throughput_rps'],
+                             change, change < -threshold))
+    return rows
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP 端到端性能基准')
+    parser.add_argument('--scales', default='small,medium', help=f"数据规模，逗号分隔（{'/'.join(SCALES)}）")
+    parser.add_argument('--endpoints', help='只测试指定接口，逗号分隔（默认全部）')
+    parser.add_argument('--requests', type=int, default=200, help='每个接口的请求数')
+    parser.add_argument('--login-requests', type=int, default=20, help='登录接口的请求数（密码哈希较慢）')
+    parser.add_argument('--concurrency', type=int, default=1, help='并发客户端数')
+    parser.add_argument('--warmup', type=int, default=5, help='每个接口正式计时前的预热请求数')
+    parser.add_argument('--server', action='store_true', help='通过本地多线程 WSGI 服务器请求（默认用 Flask 测试客户端）')
+    parser.add_argument('--database-url', help='数据库地址（默认临时 SQLite 文件；会删除该库中的全部表）')
+    parser.add_argument('--output', default='bench_http_report.json', help='JSON 报告路径')
+    parser.add_argument('--baseline', help='作为对比基准的 JSON 报告')
+    parser.add_argument('--threshold', type=float, default=0.2, help='判定退化的变化比例（默认 0.2 即 20%%）')
+    args = parser.parse_args()
+
+    scales = [scale.strip() for scale in args.scales.split(',') if scale.strip()]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"未知的数据规模: {', '.join(unknown)}")
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        workdir = tempfile.mkdtemp(prefix='bench_http_')
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    sys.path.insert(0, BASE_DIR)
+
+    from app import (app, db, DATABASE_BACKEND, User, audit_writer, password_hasher, rate_limiter,
+                     rebuild_task_daily_stats, rebuild_task_search_index, user_cache)
+    from migrations import upgrade
+    from seed_data import ADMIN_PASSWORD, EMPLOYEE_PASSWORD, reset_schema, seed_database
+
+    # 基准中每个用户的请求频率远超正常使用，不能被限流
+    rate_limiter.limit = 10 ** 9
+    endpoints = build_endpoints(date.today())
+    if args.endpoints:
+        selected = {name.strip() for name in args.endpoints.split(',')}
+        endpoints = [endpoint for endpoint in endpoints if endpoint[0] in selected]
+
+    report = {
+        'version': REPORT_VERSION,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'database': DATABASE_BACKEND,
+        'mode': 'server' if args.server else 'test_client',
+        'concurrency': args.concurrency,
+        'scales': {}
+    }
+
+    server = None
+    if args.server:
+        server = LocalServer(app).__enter__()
+        make_client = lambda: HttpClient(server.base_url)
+    else:
+        make_client = lambda: TestClient(app)
+
+    try:
+        for scale in scales:
+            spec = SCALES[scale]
+            with app.app_context():
+                print(f"[{scale}] 生成测试数据: {spec}")
+                reset_schema(db, upgrade)
+                counts = seed_database(
+                    db.engine, db.metadata, password_hasher.hash_many,
+                    users=spec['users'], tasks=spec['tasks'], logs=spec['logs'],
+                    security_events=spec['security_events'], days=spec['days'], seed=42, log=lambda message: None
+                )
+                rebuild_task_daily_stats()
+                rebuild_task_search_index()
+                employee = db.session.query(User.username).filter(User.role == 'employee').order_by(User.id).first()
+                db.session.remove()
+            user_cache.invalidate()
+
+            credentials = {
+                'manager': {'username': 'admin', 'password': ADMIN_PASSWORD},
+                'employee': {'username': employee.username, 'password': EMPLOYEE_PASSWORD}
+            }
+            results = {}
+            for endpoint in endpoints:
+                requests = args.login_requests if endpoint[0] == 'login' else args.requests
+                result = run_endpoint(make_client, credentials, endpoint, requests, args.concurrency, args.warmup)
+                # 异步审计日志写完后再测下一个接口，避免互相干扰
+                audit_writer.flush(timeout=60)
+                results[endpoint[0]] = result
+                print(f"  {endpoint[0]:<20} p50 {result['p50_ms']:>9.1f} ms  p95 {result['p95_ms']:>9.1f} ms  "
+                      f"p99 {result['p99_ms']:>9.1f} ms  {result['throughput_rps']:>8.1f} req/s"
+                      + (f"  失败 {result['errors']}" if result['errors'] else ''))
+            report['scales'][scale] = {'data': {**counts, 'days': spec['days']}, 'endpoints': results}
+    finally:
+        if server:
+            server.__exit__(None, None, None)
+
+    exit_code = 0
+    if any(result['errors'] for scale in report['scales'].values() for result in scale['endpoints'].values()):
+        print("存在状态码不符合预期的请求")
+        exit_code = 1
+
+    if baseline:
+        rows = compare(report, baseline, args.threshold)
+        report['baseline'] = {
+            'path': args.baseline,
+            'git_revision': baseline.get('git_revision'),
+            'threshold': args.threshold,
+            'comparison': [
+                {'scale': scale, 'endpoint': name, 'metric': metric, 'baseline': base, 'current': current,
+                 'change': round(change, 4), 'regression': regressed}
+                for scale, name, metric, base, current, change, regressed in rows
+            ]
+        }
+        print(f"\n与基准 {args.baseline} 对比（阈值 {args.threshold:.0%}）:")
+        for key in ('database', 'mode', 'concurrency'):
+            if baseline.get(key) != report[key]:
+                print(f"  注意：基准的 {key} 为 {baseline.get(key)}，本次为 {report[key]}，结果不可直接比较")
+        for scale, name, metric, base, current, change, regressed in rows:
+            print(f"  {scale:<8} {name:<20} {metric:<15} {base:>10} -> {current:>10}  {change:+7.1%}"
+                  + ('  退化' if regressed else ''))
+        if any(row[-1] for row in rows):
+            exit_code = 1
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n报告已写入 {args.output}")
+    audit_writer.close()
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
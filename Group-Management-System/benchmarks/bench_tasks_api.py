@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+/api/tasks 序列化性能基准
+在临时数据库中生成大量任务，对比旧实现（ORM全量加载 + 逐行懒加载用户）
+与新实现（单次JOIN列投影查询）的耗时。
+
+用法: python benchmarks/bench_tasks_api.py --tasks 100000 --users 1000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def seed(db, User, Task, num_users, num_tasks):
+    """用 executemany 批量生成测试数据"""
+    now = datetime.utcnow()
+    users = [
+        {
+            'id': i,
+            'username': f'bench{i:06d}',
+            'password_hash': 'x',
+            'role': 'employee',
+            'name': f'员工{i:06d}',
+            'created_at': now,
+            'is_active': True,
+            'login_attempts': 0
+        }
+        for i in range(1, num_users + 1)
+    ]
+    today = date.today()
+    tasks = [
+        {
+            'title': f'任务{i}',
+            'description': '完成本周的项目进度报告，包括完成情况和下周计划',
+            'date': today - timedelta(days=random.randint(0, 365)),
+            'status': 'in_progress',
+            'priority': random.choice(['low', 'medium', 'high']),
+            'user_id': random.randint(1, num_users),
+            'created_at': now,
+            'updated_at': now
+        }
+        for i in range(num_tasks)
+    ]
+    with db.engine.begin() as conn:
+        conn.execute(User.__table__.insert(), users)
+        for start in range(0, len(tasks), 50000):
+            conn.execute(Task.__table__.insert(), tasks[start:start + 50000])
+
+
+def legacy_serialize(Task):
+    """旧实现：Task.query.all() 后逐行访问 task.user"""
+    return [
+        {
+            'id': task.id,
+            'title': task.title,
+            'description': task.description,
+            'date': task.date.strftime('%Y-%m-%d'),
+            'status': task.status,
+            'priority': task.priority,
+            'user_name': task.user.name,
+            'user_id': task.user_id,
+            'user_username': task.user.username
+        }
+        for task in Task.query.all()
+    ]
+
+
+def measure(func, repeat, reset):
+    timings = []
+    for _ in range(repeat):
+        reset()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='/api/tasks 序列化性能基准')
+    parser.add_argument('--tasks', type=int, default=100000, help='任务数量')
+    parser.add_argument('--users', type=int, default=1000, help='用户数量')
+    parser.add_argument('--repeat', type=int, default=3, help='每种实现重复次数（取中位数）')
+    args = parser.parse_args()
+
+    random.seed(42)
+    workdir = tempfile.mkdtemp(prefix='bench_tasks_')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    sys.path.insert(0, BASE_DIR)
+
+    from app import app, db, User, Task, task_list_query, serialize_task_rows
+
+    with app.app_context():
+        db.create_all()
+        print(f"生成 {args.users} 个用户、{args.tasks} 个任务...")
+        seed(db, User, Task, args.users, args.tasks)
+
+        legacy = measure(lambda: legacy_serialize(Task), args.repeat, db.session.remove)
+        projected = measure(lambda: serialize_task_rows(task_list_query().all()), args.repeat, db.session.remove)
+
+    print(f"旧实现（ORM + 懒加载用户）: {legacy * 1000:.1f} ms")
+    print(f"新实现（JOIN + 列投影）:     {projected * 1000:.1f} ms")
+    print(f"加速比: {legacy / projected:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+接口端到端检查
+在迁移到最新版本的临时数据库上，通过 Flask 测试客户端走一遍主要接口，
+任何一项不符合预期就以非零状态退出，可用于提交前或切换数据库后检查。
+
+覆盖：迁移（全新建库、重复执行）、登录、任务增删改、批量操作（整批校验）和并发写入（PostgreSQL 上为 advisory lock）
+后的统计/变更日志一致性、任务和日志的游标分页、任务搜索（FTS5 或 ILIKE 退化）、
+日志前缀筛选、安全事件、统计、用户列表和 CSV 导出。
+
+数据库由 DATABASE_URL 指定（或 --database-url），未指定时使用临时 SQLite 文件；
+PostgreSQL 在临时 schema 中建表，检查结束后删除，不影响库中已有的数据。
+
+用法:
+    python check_endpoints.py
+    DATABASE_URL=postgresql://postgres@localhost/postgres python check_endpoints.py
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import uuid
+from datetime import date, timedelta
+
+FAILURES = []
+
+
+def check(name, ok, detail=''):
+    print(f"[{'通过' if ok else '失败'}] {name}" + (f"：{detail}" if detail and not ok else ''))
+    if not ok:
+        FAILURES.append(name)
+
+
+def login(app, username, password):
+    client = app.test_client()
+    response = client.post('/login', data={'username': username, 'password': password})
+    if response.status_code != 302:
+        raise RuntimeError(f'{username} 登录失败（状态码 {response.status_code}）')
+    return client
+
+
+def paginate(client, path, key, params):
+    """按 next_cursor 翻完所有页，返回全部记录"""
+    items = []
+    cursor = None
+    for _ in range(1000):
+        query = dict(params, **({'cursor': cursor} if cursor else {}))
+        data = client.get(path, query_string=query).get_json()
+        items.extend(data[key])
+        cursor = data.get('next_cursor')
+        if not cursor:
+            break
+    return items
+
+
+def run_checks():
+    from app import (app, db, DATABASE_BACKEND, User, Task, TaskDailyStat, TaskChange, TaskMonthVersion,
+                     audit_writer, password_hasher, rate_limiter, task_search_ready)
+    from migrations import MIGRATIONS, applied_versions, upgrade
+
+    app.config['TESTING'] = True
+    # 检查中所有请求来自同一个IP和少数用户，不能被限流
+    rate_limiter.limit = 10 ** 9
+    today = date.today()
+    print(f"数据库: {DATABASE_BACKEND}")
+
+    # 1. 迁移
+    with app.app_context():
+        db.create_all()
+        upgrade(db.engine, db.metadata, verbose=False)
+        check('迁移全部执行', applied_versions(db.engine) == {version for version, _, _ in MIGRATIONS})
+        check('重复执行迁移不做修改', upgrade(db.engine, db.metadata, verbose=False) == [])
+
+        admin_hash, employee_hash = password_hasher.hash_many(['admin123', '123456'])
+        db.session.add(User(username='admin', password_hash=admin_hash, name='管理员', role='manager'))
+        for i in range(1, 5):
+            db.session.add(User(username=f'emp{i}', password_hash=employee_hash, name=f'员工{i}', role='employee'))
+        db.session.commit()
+
+    manager = login(app, 'admin', 'admin123')
+    employee = login(app, 'emp1', '123456')
+
+    # 2. 任务增删改
+    response = employee.post('/api/tasks', json={
+        'title': 'Quarterly REPORT 周报', 'description': '整理本季度项目进度', 'date': today.isoformat()
+    })
+    check('新建任务', response.status_code in (200, 201), response.get_data(as_text=True))
+    task_id = response.get_json().get('id')
+    response = employee.put(f'/api/tasks/{task_id}', json={
+        'title': 'Quarterly REPORT 周报', 'description': '整理本季度项目进度和风险', 'date': today.isoformat()
+    })
+    check('更新任务', response.status_code == 200, response.get_data(as_text=True))
+    response = employee.post('/api/tasks', json={'title': '临时任务', 'date': today.isoformat()})
+    response = employee.delete(f"/api/tasks/{response.get_json().get('id')}")
+    check('删除任务', response.status_code == 200, response.get_data(as_text=True))
+
+    # 3. 并发写入后统计、变更日志和月份版本一致
+    # 多个客户端同时给同一员工的相同日期新建任务，争用同一行日统计（"先更新、无行再插入"）
+    errors = []
+    clients = [login(app, 'emp2', '123456') for _ in range(4)]
+    barrier = threading.Barrier(len(clients))
+
+    def writer(client):
+        barrier.wait()
+        for i in range(15):
+            day = today - timedelta(days=i % 5)
+            response = client.post('/api/tasks', json={'title': f'并发任务{i}', 'date': day.isoformat()})
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+
+    threads = [threading.Thread(target=writer, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with app.app_context():
+        task_count = Task.query.count()
+        stat_total = db.session.query(db.func.sum(TaskDailyStat.total_count)).scalar()
+        change_count = TaskChange.query.count()
+        month_total = db.session.query(db.func.sum(TaskMonthVersion.version)).scalar()
+    check('并发新建任务', not errors and task_count == 61, f'失败状态码 {errors}，任务数 {task_count}')
+    check('并发写入后日统计一致', stat_total == task_count, f'统计 {stat_total}，任务 {task_count}')
+    # 新建 62 个、更新 1 个、删除 1 个，每次写入一条变更和一次月份版本递增
+    check('并发写入后变更日志完整', change_count == 64, f'变更 {change_count}')
+    check('并发写入后月份版本完整', month_total == 64, f'版本合计 {month_total}')
+    version = manager.get('/api/tasks?limit=1').get_json()['version']
+    changes = manager.get(f'/api/tasks/changes?since={version - 5}').get_json()
+    check('增量同步', not changes['reset'] and len(changes['changes']) == 5, str(changes)[:200])
+
+    # 批量操作：任意一项校验失败时整批不执行，逐项返回结果
+    before = manager.get('/api/tasks', query_string={'user_id': 2}).get_json()
+    response = employee.post('/api/tasks/batch', json={'operations': [
+        {'op': 'create', 'title': '批量新建', 'date': today.isoformat()},
+        {'op': 'update', 'id': task_id, 'title': '批量修改', 'date': today.isoformat()},
+        {'op': 'delete', 'id': True},
+        {'op': 'create', 'title': '', 'date': today.isoformat()}
+    ]})
+    results = (response.get_json() or {}).get('results', [])
+    check('批量操作部分无效时整批拒绝', response.status_code == 400
+          and [result['ok'] for result in results] == [True, True, False, False]
+          and [result['index'] for result in results] == [0, 1, 2, 3], str(results))
+    after = manager.get('/api/tasks', query_string={'user_id': 2}).get_json()
+    check('批量操作被拒绝时未做修改', after == before)
+    response = employee.post('/api/tasks/batch', json={'operations': [{'op': 'delete', 'id': True}]})
+    check('批量操作拒绝布尔值ID', response.status_code == 400
+          and manager.get('/api/tasks', query_string={'user_id': 2}).get_json() == before, response.get_data(as_text=True))
+    response = employee.post('/api/tasks/batch', json={'operations': [
+        {'op': 'create', 'title': 123, 'date': today.isoformat()},
+        {'op': 'create', 'title': '类型错误', 'priority': ['x'], 'date': today.isoformat()},
+        {'op': 'create', 'title': '类型错误', 'description': {'a': 1}, 'date': today.isoformat()},
+        {'op': 'update', 'id': task_id, 'priority': 'bogus', 'date': today.isoformat()}
+    ]})
+    results = (response.get_json() or {}).get('results', [])
+    check('批量操作拒绝类型或取值错误的字段', response.status_code == 400
+          and [result['ok'] for result in results] == [False] * 4
+          and manager.get('/api/tasks', query_string={'user_id': 2}).get_json() == before, response.get_data(as_text=True)[:200])
+    temporary_id = employee.post('/api/tasks', json={'title': '临时任务', 'date': today.isoformat()}).get_json()['id']
+    response = employee.post('/api/tasks/batch', json={'operations': [
+        {'op': 'update', 'id': task_id, 'title': 'Quarterly REPORT 周报', 'description': '整理本季度项目进度和风险',
+         'date': today.isoformat()},
+        {'op': 'delete', 'id': temporary_id}
+    ]})
+    results = response.get_json().get('results', [])
+    check('批量操作全部有效时执行', response.status_code == 200 and all(result['ok'] for result in results)
+          and len(manager.get('/api/tasks', query_string={'user_id': 2}).get_json()) == len(before), str(results))
+
+    # 4. 游标分页
+    expected = manager.get('/api/tasks').get_json()
+    paged = paginate(manager, '/api/tasks', 'tasks', {'limit': 7})
+    check('任务游标分页', [task['id'] for task in paged] == [task['id'] for task in expected],
+          f'分页 {len(paged)} 条，全量 {len(expected)} 条')
+    paged = paginate(manager, '/api/tasks', 'tasks', {'limit': 7, 'user_id': 3})
+    check('任务按员工游标分页', len(paged) == 60 and all(task['user_id'] == 3 for task in paged), f'{len(paged)} 条')
+
+    # 5. 搜索（SQLite FTS5；其他数据库按词 ILIKE）
+    with app.app_context():
+        mode = 'FTS5' if task_search_ready() else 'LIKE'
+    for keyword in ('report', 'REPORT 周报', '项目进度'):
+        titles = [task['title'] for task in manager.get('/api/tasks/search', query_string={'q': keyword}).get_json()['tasks']]
+        check(f"搜索 '{keyword}'（{mode}）",
+              titles == ['Quarterly REPORT 周报'], str(titles))
+    response = manager.get('/api/tasks/search', query_string={'q': '100%_'})
+    check('搜索通配符转义', response.status_code == 200 and response.get_json()['tasks'] == [])
+
+    # 6. 日志和安全事件
+    app.test_client().post('/login', data={'username': 'emp1', 'password': 'wrong'})
+    audit_writer.flush(timeout=30)
+    logs = paginate(manager, '/api/logs', 'logs', {'per_page': 3})
+    full = manager.get('/api/logs', query_string={'per_page': 200}).get_json()['logs']
+    check('日志游标分页', [log['id'] for log in logs] == [log['id'] for log in full] and len(logs) > 3,
+          f'分页 {len(logs)} 条，全量 {len(full)} 条')
+    prefix = manager.get('/api/logs', query_string={'action': '用户', 'match': 'prefix', 'per_page': 200}).get_json()['logs']
+    check('日志前缀筛选', prefix and all(log['action'].startswith('用户') for log in prefix), str(prefix)[:200])
+    response = manager.get('/api/logs', query_string={'action': '用户%', 'match': 'prefix'})
+    check('日志前缀筛选转义', response.status_code == 200 and response.get_json()['logs'] == [])
+    events = manager.get('/api/security-events', query_string={'event_type': 'LOGIN_FAILED'}).get_json()['events']
+    check('安全事件', len(events) == 1, str(events)[:200])
+    check('安全事件（职员无权限）', employee.get('/api/security-events').status_code == 403)
+
+    # 7. 统计、用户和导出
+    stats = manager.get('/api/stats', query_string={
+        'start_date': (today - timedelta(days=30)).isoformat(), 'end_date': today.isoformat()
+    })
+    check('统计', stats.status_code == 200, stats.get_data(as_text=True)[:200])
+    users = manager.get('/api/users', query_string={'q': 'emp', 'match': 'prefix'}).get_json()
+    check('用户前缀搜索', sorted(user['username'] for user in users) == ['emp1', 'emp2', 'emp3', 'emp4'],
+          str(users)[:200])
+    users = paginate(manager, '/api/users', 'users', {'limit': 3})
+    check('用户游标分页', len(users) == 4, str(users)[:200])
+    export = manager.get('/api/export-csv')
+    lines = export.get_data(as_text=True).strip().splitlines()
+    check('CSV导出', export.status_code == 200 and len(lines) == task_count + 1, f'{len(lines)} 行')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='接口端到端检查')
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'),
+                        help='数据库地址（默认读取 DATABASE_URL，未设置时使用临时 SQLite 文件）')
+    args = parser.parse_args()
+    # 检查时用低强度哈希，加快登录
+    os.environ.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+
+    schema = None
+    if args.database_url and not args.database_url.startswith('sqlite'):
+        # 在临时 schema 中建表，不影响库中已有的数据
+        from sqlalchemy import create_engine, text
+        from sqlalchemy.engine import make_url
+        from storage import normalize_database_url
+        url = make_url(normalize_database_url(args.database_url))
+        schema = f'check_endpoints_{uuid.uuid4().hex[:8]}'
+        admin_engine = create_engine(url)
+        with admin_engine.begin() as conn:
+            conn.execute(text(f'CREATE SCHEMA {schema}'))
+        os.environ['DATABASE_URL'] = url.update_query_dict({'options': f'-csearch_path={schema}'}) \
+            .render_as_string(hide_password=False)
+    else:
+        workdir = tempfile.mkdtemp(prefix='check_endpoints_')
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'check.db')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    try:
+        run_checks()
+    finally:
+        from app import app, db, audit_writer
+        audit_writer.close()
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+        if schema:
+            with admin_engine.begin() as conn:
+                conn.execute(text(f'DROP SCHEMA {schema} CASCADE'))
+
+    if FAILURES:
+        print(f"{len(FAILURES)} 项检查未通过")
+        sys.exit(1)
+    print("所有接口检查通过")
+
+
+if __name__ == '__main__':
+    main()
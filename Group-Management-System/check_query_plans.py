@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+热点查询执行计划检查
+在迁移到最新版本的临时数据库上对各热点接口的查询执行 EXPLAIN，
+只要有查询对热点表做了不走索引的全表扫描就以非零状态退出，可用于提交前检查。
+
+默认使用临时 SQLite 文件；--database-url 指定 PostgreSQL 时在其中创建临时 schema，检查结束后删除。
+PostgreSQL 在空表上总是倾向顺序扫描，因此检查时关闭 enable_seqscan，仍出现 Seq Scan 说明没有可用的索引。
+
+用法:
+    python check_query_plans.py              # 使用临时 SQLite 数据库
+    python check_query_plans.py --verbose    # 同时打印每个查询的执行计划
+    python check_query_plans.py --database-url postgresql://postgres@localhost/postgres
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import uuid
+from datetime import date, datetime, timedelta
+
+HOT_TABLES = ('task', 'log', 'security_event', 'trusted_device', 'user', 'blocked_ip', 'task_daily_stat', 'task_change')
+
+
+def hot_queries():
+    """返回 (名称, 查询) 列表，查询条件与对应接口保持一致"""
+    import task_search
+    from app import (db, User, Task, Log, SecurityEvent, TrustedDevice, TaskDailyStat, TaskChange, DATABASE_BACKEND,
+                     task_list_query, filter_task_query, calendar_window, export_task_query, match_condition)
+
+    today = date.today()
+    window_start, window_end = calendar_window(today.strftime('%Y-%m'))
+    keyset = db.or_(Task.date < today, db.and_(Task.date == today, Task.id < 1000))
+    task_order = (Task.date.desc(), Task.id.desc())
+    log_order = (Log.created_at.desc(), Log.id.desc())
+    event_order = (SecurityEvent.created_at.desc(), SecurityEvent.id.desc())
+
+    queries = [
+        ('GET /api/tasks（职员）',
+         filter_task_query(task_list_query(), user_id=1).order_by(*task_order)),
+        ('GET /api/tasks?month=（领导日历）',
+         filter_task_query(task_list_query(), start_date=window_start, end_date=window_end).order_by(*task_order)),
+        ('GET /api/tasks?limit=&cursor=（领导分页）',
+         task_list_query().filter(keyset).order_by(*task_order).limit(500)),
+        ('GET /api/tasks?user_id=&limit=（领导按员工筛选）',
+         filter_task_query(task_list_query(), user_id=1).filter(keyset).order_by(*task_order).limit(500)),
+        ('GET /api/export-csv（日期范围）',
+         export_task_query(today - timedelta(days=30), today)),
+        ('GET /api/stats（领导）',
+         TaskDailyStat.query.filter(TaskDailyStat.date >= today - timedelta(days=30),
+                                    TaskDailyStat.date <= today)),
+        ('GET /api/stats（职员）',
+         TaskDailyStat.query.filter(TaskDailyStat.user_id == 1,
+                                    TaskDailyStat.date >= today - timedelta(days=30),
+                                    TaskDailyStat.date <= today)),
+        ('GET /api/tasks/changes（领导）',
+         TaskChange.query.filter(TaskChange.id > 100).order_by(TaskChange.id).limit(1001)),
+        ('GET /api/tasks/changes（职员）',
+         TaskChange.query.filter(TaskChange.user_id == 1, TaskChange.id > 100).order_by(TaskChange.id).limit(1001)),
+        ('GET /api/users?limit=&cursor=',
+         db.session.query(User.id, User.name, User.username, User.last_login)
+         .filter(User.role == 'employee', db.or_(User.name > '张', db.and_(User.name == '张', User.id > 1)))
+         .order_by(User.name, User.id).limit(101)),
+        ('GET /api/users?q=&match=prefix',
+         db.session.query(User.id, User.name, User.username, User.last_login)
+         .filter(User.role == 'employee',
+                 db.or_(match_condition(User.username, 'zh', 'prefix'), match_condition(User.name, '张', 'prefix')))
+         .order_by(User.name, User.id).limit(101)),
+        ('GET /api/users?with_stats=1（汇总）',
+         db.session.query(TaskDailyStat.user_id, db.func.sum(TaskDailyStat.total_count), db.func.max(TaskDailyStat.date))
+         .filter(TaskDailyStat.user_id.in_([1, 2, 3])).group_by(TaskDailyStat.user_id)),
+        ('GET /api/logs?cursor=',
+         Log.query.filter(db.tuple_(Log.created_at, Log.id) < (datetime.utcnow(), 1000))
+         .order_by(*log_order).limit(51)),
+        ('GET /api/logs?user_id=',
+         Log.query.filter(Log.user_id == 1).order_by(*log_order).limit(51)),
+        ('GET /api/logs?action=（精确）',
+         Log.query.filter(Log.action == '登录').order_by(*log_order).limit(51)),
+        ('GET /api/logs?action=&match=prefix',
+         Log.query.filter(match_condition(Log.action, '查看', 'prefix')).order_by(*log_order).limit(51)),
+        ('GET /api/logs?start_date=&end_date=',
+         Log.query.filter(Log.created_at >= datetime(today.year, 1, 1),
+                          Log.created_at < datetime.utcnow()).order_by(*log_order).limit(51)),
+        ('GET /api/security-events?cursor=',
+         SecurityEvent.query.filter(db.tuple_(SecurityEvent.created_at, SecurityEvent.id) < (datetime.utcnow(), 1000))
+         .order_by(*event_order).limit(51)),
+        ('GET /api/security-events?ip_address=&match=prefix',
+         SecurityEvent.query.filter(match_condition(SecurityEvent.ip_address, '10.0.', 'prefix'))
+         .order_by(*event_order).limit(51)),
+        ('GET /api/security-events?event_type=（精确）',
+         SecurityEvent.query.filter(SecurityEvent.event_type == 'RATE_LIMIT_EXCEEDED').order_by(*event_order).limit(51)),
+        ('登录：受信任设备检查',
+         TrustedDevice.query.filter_by(user_id=1, device_hash='x' * 64, ip_address='127.0.0.1', is_active=True)),
+    ]
+    if DATABASE_BACKEND == 'sqlite':
+        queries.append(('GET /api/tasks/search（职员）',
+                        task_search.search_statement('"会议"', user_id=1, start_date=str(today - timedelta(days=30)), limit=21)))
+    return queries
+
+
+def explain(conn, query):
+    """返回查询的执行计划（每个节点一行）"""
+    statement = query.statement if hasattr(query, 'statement') else query
+    sql = str(statement.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True}))
+    if conn.dialect.name == 'sqlite':
+        return [row[-1] for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql)]
+    return [row[0] for row in conn.exec_driver_sql('EXPLAIN ' + sql)]
+
+
+def full_scans(plan):
+    """找出计划中不走索引的热点表扫描"""
+    problems = []
+    for detail in plan:
+        match = (re.match(r'SCAN (\w+)(?: AS \w+)?$', detail)
+                 or re.search(r'Seq Scan on "?(\w+)"?', detail))
+        if match and match.group(1) in HOT_TABLES:
+            problems.append(detail.strip())
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='热点查询执行计划检查')
+    parser.add_argument('--verbose', action='store_true', help='打印每个查询的执行计划')
+    parser.add_argument('--database-url', help='在指定的 PostgreSQL 数据库中检查（默认使用临时 SQLite 文件）')
+    args = parser.parse_args()
+
+    schema = None
+    if args.database_url:
+        # 在临时 schema 中建表，不影响库中已有的数据
+        from sqlalchemy import create_engine, text
+        from sqlalchemy.engine import make_url
+        url = make_url(args.database_url)
+        schema = f'query_plans_{uuid.uuid4().hex[:8]}'
+        admin_engine = create_engine(url)
+        with admin_engine.begin() as conn:
+            conn.execute(text(f'CREATE SCHEMA {schema}'))
+        os.environ['DATABASE_URL'] = url.update_query_dict({'options': f'-csearch_path={schema}'}) \
+            .render_as_string(hide_password=False)
+    else:
+        workdir = tempfile.mkdtemp(prefix='query_plans_')
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'plans.db')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    from app import app, db
+    from migrations import upgrade
+
+    failed = False
+    try:
+        with app.app_context():
+            db.create_all()
+            upgrade(db.engine, db.metadata, verbose=False)
+
+            with db.engine.connect() as conn:
+                if conn.dialect.name == 'postgresql':
+                    conn.exec_driver_sql('SET enable_seqscan = off')
+                for name, query in hot_queries():
+                    plan = explain(conn, query)
+                    problems = full_scans(plan)
+                    print(f"[{'失败' if problems else '通过'}] {name}")
+                    if args.verbose or problems:
+                        for detail in plan:
+                            print(f"    {detail}")
+                    failed = failed or bool(problems)
+            db.engine.dispose()
+    finally:
+        if schema:
+            with admin_engine.begin() as conn:
+                conn.execute(text(f'DROP SCHEMA {schema} CASCADE'))
+
+    if failed:
+        print("存在全表扫描的热点查询，请检查索引")
+        sys.exit(1)
+    print("所有热点查询均使用索引")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+事件推送模块
+任务增删改、安全事件等发布到事件总线，SSE 连接订阅后实时推送给浏览器。
+后端可插拔：
+- memory: 进程内发布订阅（单进程部署，默认）
+- sqlite: 本地 SQLite(WAL) 共享文件作为简易消息中转，
+  每个 worker 进程轮询该文件，订阅者也能收到其他进程发布的事件
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+Event = namedtuple('Event', ['channel', 'data'])
+
+
+class Subscription:
+    """一个订阅者（一条 SSE 连接）的事件队列
+
+    队列满时丢弃新事件并设置 overflowed，推送端据此通知客户端重新同步。
+    """
+
+    def __init__(self, bus, channels, max_queue):
+        self.channels = frozenset(channels)
+        self.overflowed = False
+        self._bus = bus
+        self._queue = queue.Queue(max_queue)
+
+    def deliver(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout=None):
+        """等待下一个事件，超时返回 None"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._bus.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class LocalEventBus:
+    """进程内发布订阅"""
+
+    def __init__(self, max_queue=1000):
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def subscribe(self, channels):
+        subscription = Subscription(self, channels, self.max_queue)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, channel, data):
+        """发布事件，data 需可被 JSON 序列化"""
+        self._dispatch(channel, data)
+
+    def _dispatch(self, channel, data):
+        with self._lock:
+            subscribers = [s for s in self._subscribers if channel in s.channels]
+        if subscribers:
+            event = Event(channel, data)
+            for subscription in subscribers:
+                subscription.deliver(event)
+
+
+class SQLiteEventBus(LocalEventBus):
+    """以共享 SQLite 文件作为消息中转的事件总线
+
+    publish 只写入文件；每个进程在有订阅者后启动一个轮询线程，
+    按自增ID读取新事件并分发给本进程的订阅者。旧事件超过保留时间后清理。
+    """
+
+    def __init__(self, path, poll_interval=0.5, retention=300, max_queue=1000, timeout=5.0):
+        super().__init__(max_queue)
+        self._path = path
+        self._timeout = timeout
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._local = threading.local()
+        self._poller = None
+        self._poller_pid = None
+        self._poller_lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS bus_event ('
+            ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' channel TEXT NOT NULL,'
+            ' payload TEXT NOT NULL,'
+            ' created REAL NOT NULL)'
+        )
+
+    def _connect(self):
+        """每个线程使用独立连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self._path, timeout=self._timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def publish(self, channel, data):
+        self._connect().execute(
+            'INSERT INTO bus_event (channel, payload, created) VALUES (?, ?, ?)',
+            (channel, json.dumps(data, ensure_ascii=False), time.time())
+        )
+
+    def subscribe(self, channels):
+        self._ensure_poller()
+        return super().subscribe(channels)
+
+    def _ensure_poller(self):
+        # fork 之后子进程需要自己的轮询线程
+        if self._poller is not None and self._poller_pid == os.getpid() and self._poller.is_alive():
+            return
+        with self._poller_lock:
+            if self._poller is not None and self._poller_pid == os.getpid() and self._poller.is_alive():
+                return
+            last_id = self._connect().execute('SELECT COALESCE(MAX(id), 0) FROM bus_event').fetchone()[0]
+            self._poller = threading.Thread(target=self._poll, args=(last_id,), name='event-bus-poller', daemon=True)
+            self._poller_pid = os.getpid()
+            self._poller.start()
+
+    def _poll(self, last_id):
+        conn = self._connect()
+        last_cleanup = time.monotonic()
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                rows = conn.execute(
+                    'SELECT id, channel, payload FROM bus_event WHERE id > ? ORDER BY id LIMIT 1000',
+                    (last_id,)
+                ).fetchall()
+                for event_id, channel, payload in rows:
+                    last_id = event_id
+                    self._dispatch(channel, json.loads(payload))
+
+                if time.monotonic() - last_cleanup >= self.retention:
+                    last_cleanup = time.monotonic()
+                    conn.execute('DELETE FROM bus_event WHERE created < ?', (time.time() - self.retention,))
+            except sqlite3.Error as e:
+                print(f"事件总线轮询失败: {e}")
+
+
+def create_event_bus(config):
+    """根据应用配置创建事件总线"""
+    backend_name = config.get('EVENT_BUS_BACKEND', 'memory')
+    max_queue = config.get('SSE_QUEUE_SIZE', 1000)
+
+    if backend_name == 'memory':
+        return LocalEventBus(max_queue=max_queue)
+    if backend_name == 'sqlite':
+        return SQLiteEventBus(
+            config['EVENT_BUS_SQLITE_PATH'],
+            poll_interval=config.get('EVENT_BUS_POLL_INTERVAL', 0.5),
+            max_queue=max_queue
+        )
+    raise ValueError(f'未知的事件总线后端: {backend_name}')
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+导出格式模块
+把逐块产生的导出数据转换成其他格式，全部以生成器方式工作，便于流式响应：
+- gzip 压缩的CSV（标准库 zlib）
+- Parquet / Arrow IPC 列式格式（可选依赖 pyarrow，未安装时不可用）
+"""
+
+import itertools
+import zlib
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+COLUMNAR_FORMATS = ('parquet', 'arrow')
+
+
+def columnar_available():
+    """是否安装了列式格式所需的 pyarrow"""
+    return pa is not None
+
+
+def gzip_chunks(chunks, level=6):
+    """把文本/字节块流式压缩为 gzip 格式"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class _ChunkSink:
+    """供 pyarrow 写入的类文件对象，写入的字节暂存起来由生成器逐块取走"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _arrow_type(kind):
+    return {
+        'string': pa.string(),
+        'date': pa.date32(),
+        'timestamp': pa.timestamp('us')
+    }[kind]
+
+
+def columnar_chunks(rows, columns, fmt, batch_rows=10000):
+    """把行迭代器按批转换为列式格式的字节块
+
+    columns 为 [(列名, 类型)]，类型取 'string' / 'date' / 'timestamp'；
+    Parquet 每批写成一个 row group，Arrow 使用可流式读取的 IPC stream 格式。
+    """
+    if not columnar_available():
+        raise RuntimeError('列式导出需要安装 pyarrow')
+    if fmt not in COLUMNAR_FORMATS:
+        raise ValueError(f'未知的列式格式: {fmt}')
+
+    schema = pa.schema([(name, _arrow_type(kind)) for name, kind in columns])
+    sink = _ChunkSink()
+    if fmt == 'parquet':
+        writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_rows))
+        if not batch:
+            break
+        arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)]
+        record_batch = pa.RecordBatch.from_arrays(arrays, schema=schema)
+        if fmt == 'parquet':
+            writer.write_table(pa.Table.from_batches([record_batch]))
+        else:
+            writer.write_batch(record_batch)
+        data = sink.drain()
+        if data:
+            yield data
+
+    writer.close()
+    yield sink.drain()
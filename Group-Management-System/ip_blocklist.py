@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+IP黑名单模块
+黑名单持久化在数据库中，进程内保留一份内存副本供请求前检查使用：
+- 单个地址存放在集合中，O(1) 查找
+- CIDR 网段按前缀长度分组，查找时对每种前缀长度做一次掩码后查集合
+"""
+
+import ipaddress
+import threading
+import time
+
+
+def normalize_network(value):
+    """把IP地址或CIDR网段规范化为 ip_network 对象，非法输入抛出 ValueError"""
+    return ipaddress.ip_network(value.strip(), strict=False)
+
+
+class IPBlocklist:
+    """内存中的IP黑名单
+
+    loader 返回当前所有被阻止的地址/网段字符串；
+    refresh_interval 秒后自动重新加载，以便多个 worker 进程之间同步。
+    """
+
+    def __init__(self, loader, refresh_interval=60):
+        self._loader = loader
+        self._refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._addresses = frozenset()
+        self._networks = {}
+        self._loaded_at = None
+
+    def load(self):
+        """从数据源重新加载黑名单"""
+        addresses = set()
+        networks = {}
+        for value in self._loader():
+            try:
+                network = normalize_network(value)
+            except ValueError:
+                continue
+            if network.num_addresses == 1:
+                addresses.add(network.network_address)
+            else:
+                key = (network.version, network.prefixlen)
+                networks.setdefault(key, set()).add(network.network_address)
+
+        with self._lock:
+            self._addresses = frozenset(addresses)
+            self._networks = {key: frozenset(value) for key, value in networks.items()}
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """标记缓存失效，下次检查时重新加载"""
+        with self._lock:
+            self._loaded_at = None
+
+    def _ensure_fresh(self):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at >= self._refresh_interval:
+            self.load()
+
+    def contains(self, ip_address):
+        """检查IP是否在黑名单中（含网段匹配）"""
+        if not ip_address:
+            return False
+        self._ensure_fresh()
+
+        try:
+            address = ipaddress.ip_address(ip_address)
+        except ValueError:
+            return False
+
+        if address in self._addresses:
+            return True
+
+        for (version, prefixlen), network_addresses in self._networks.items():
+            if version != address.version:
+                continue
+            network = ipaddress.ip_network((address, prefixlen), strict=False)
+            if network.network_address in network_addresses:
+                return True
+        return False
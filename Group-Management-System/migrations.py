@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+数据库版本迁移
+db.create_all() 只会创建缺失的表，不会给已有的表补索引或修改数据，
+因此对已有的 instance/workflow.db 的结构变更都以带版本号的迁移记录在这里。
+已执行的版本记录在 schema_migrations 表中，每个迁移在独立事务中执行且只执行一次。
+
+用法:
+    python migrations.py            # 执行所有未执行的迁移
+    python migrations.py --status   # 查看迁移状态
+"""
+
+import argparse
+import ipaddress
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, select, text
+
+import task_search
+from task_stats import rebuild_daily_stats
+
+_version_metadata = MetaData()
+schema_migrations = Table(
+    'schema_migrations', _version_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """注册一个迁移，函数签名为 func(conn, metadata)"""
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda item: item[0])
+        return func
+    return decorator
+
+
+def create_table(conn, metadata, table_name):
+    """按模型定义创建表（已存在时跳过）"""
+    metadata.tables[table_name].create(conn, checkfirst=True)
+
+
+def create_index(conn, metadata, table_name, index_name):
+    """按模型中声明的索引创建索引（已存在时跳过）"""
+    table = metadata.tables[table_name]
+    for index in table.indexes:
+        if index.name == index_name:
+            index.create(conn, checkfirst=True)
+            return
+    raise KeyError(f'模型 {table_name} 中没有声明索引 {index_name}')
+
+
+@migration(1, '导入旧版 SecurityEvent.is_blocked 标记的IP到 blocked_ip 表')
+def import_legacy_blocked_ips(conn, metadata):
+    create_table(conn, metadata, 'blocked_ip')
+    blocked_ip = metadata.tables['blocked_ip']
+    security_event = metadata.tables['security_event']
+
+    existing = set(conn.execute(select(blocked_ip.c.ip_address)).scalars())
+    legacy_ips = conn.execute(
+        select(security_event.c.ip_address).where(security_event.c.is_blocked == True).distinct()
+    ).scalars()
+
+    rows = []
+    for ip_address in legacy_ips:
+        try:
+            network = str(ipaddress.ip_network(ip_address.strip(), strict=False))
+        except ValueError:
+            continue
+        if network not in existing:
+            existing.add(network)
+            rows.append({'ip_address': network, 'reason': '从旧版安全事件标记迁移', 'created_at': datetime.utcnow()})
+
+    if rows:
+        conn.execute(blocked_ip.insert(), rows)
+
+
+@migration(2, '为任务、日志、安全事件和受信任设备的热点查询列添加组合索引')
+def add_hot_query_indexes(conn, metadata):
+    create_index(conn, metadata, 'task', 'ix_task_user_id_date')
+    create_index(conn, metadata, 'task', 'ix_task_date')
+    create_index(conn, metadata, 'log', 'ix_log_created_at')
+    create_index(conn, metadata, 'log', 'ix_log_user_id_created_at')
+    create_index(conn, metadata, 'log', 'ix_log_action_created_at')
+    create_index(conn, metadata, 'security_event', 'ix_security_event_created_at')
+    create_index(conn, metadata, 'security_event', 'ix_security_event_ip_address_created_at')
+    create_index(conn, metadata, 'security_event', 'ix_security_event_event_type_created_at')
+    create_index(conn, metadata, 'trusted_device', 'ix_trusted_device_user_device_ip')
+
+
+@migration(3, '创建任务日统计汇总表并根据现有任务回填')
+def add_task_daily_stats(conn, metadata):
+    create_table(conn, metadata, 'task_daily_stat')
+    rebuild_daily_stats(conn, metadata.tables['task'], metadata.tables['task_daily_stat'])
+
+
+@migration(4, '创建任务月份版本表（日历接口ETag）')
+def add_task_month_versions(conn, metadata):
+    create_table(conn, metadata, 'task_month_version')
+
+
+@migration(5, '创建任务变更日志表（增量同步）')
+def add_task_changes(conn, metadata):
+    create_table(conn, metadata, 'task_change')
+
+
+@migration(6, '创建任务全文索引（FTS5）并根据现有任务回填')
+def add_task_search_index(conn, metadata):
+    # 非 SQLite 或未编译 FTS5 时跳过，搜索接口退化为 LIKE 匹配
+    if not task_search.fts_supported(conn):
+        return
+    task_search.create_index(conn)
+    task_search.rebuild_index(conn, metadata.tables['task'])
+
+
+@migration(7, '为用户列表的角色筛选和姓名排序添加组合索引')
+def add_user_list_index(conn, metadata):
+    create_index(conn, metadata, 'user', 'ix_user_role_name')
+
+
+@migration(8, '加长 user.password_hash 列以容纳 scrypt 等更长的哈希')
+def widen_password_hash(conn, metadata):
+    # SQLite 不限制 VARCHAR 长度，无需修改
+    if conn.dialect.name == 'sqlite':
+        return
+    table = conn.dialect.identifier_preparer.quote('user')
+    if conn.dialect.name == 'postgresql':
+        conn.execute(text(f'ALTER TABLE {table} ALTER COLUMN password_hash TYPE VARCHAR(255)'))
+    else:
+        conn.execute(text(f'ALTER TABLE {table} MODIFY password_hash VARCHAR(255) NOT NULL'))
+
+
+@migration(9, '创建已注销自动登录令牌表（多进程共享）')
+def add_revoked_tokens(conn, metadata):
+    create_table(conn, metadata, 'revoked_token')
+
+
+def applied_versions(engine):
+    _version_metadata.create_all(engine)
+    with engine.connect() as conn:
+        return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+def upgrade(engine, metadata, verbose=True):
+    """执行所有未执行的迁移，返回本次执行的版本号列表"""
+    done = applied_versions(engine)
+    applied = []
+    for version, description, func in MIGRATIONS:
+        if version in done:
+            continue
+        with engine.begin() as conn:
+            func(conn, metadata)
+            conn.execute(schema_migrations.insert().values(
+                version=version,
+                description=description,
+                applied_at=datetime.utcnow()
+            ))
+        applied.append(version)
+        if verbose:
+            print(f"已执行迁移 {version:04d}: {description}")
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据库版本迁移')
+    parser.add_argument('--status', action='store_true', help='只查看迁移状态，不执行')
+    args = parser.parse_args()
+
+    from app import app, db
+
+    with app.app_context():
+        if args.status:
+            done = applied_versions(db.engine)
+            for version, description, _ in MIGRATIONS:
+                state = '已执行' if version in done else '未执行'
+                print(f"{version:04d} [{state}] {description}")
+            return
+
+        db.create_all()
+        applied = upgrade(db.engine, db.metadata)
+        if not applied:
+            print("数据库已是最新版本")
+
+
+if __name__ == '__main__':
+    main()
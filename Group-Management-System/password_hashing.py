@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+密码哈希
+哈希算法和强度可配置（werkzeug 的 method 写法，如 pbkdf2:sha256:600000、scrypt:32768:8:1）。
+校验和生成哈希是 CPU 密集的计算，放到有界的进程池中执行，不占用请求线程的 GIL；
+排队的任务数达到上限时直接拒绝（PasswordHasherBusy），登录高峰时请求快速失败而不是越排越长。
+用户以旧算法或旧强度保存的哈希在登录成功后按当前配置重新生成（needs_rehash）。
+"""
+
+import os
+import threading
+from functools import cached_property
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    """等待中的哈希任务已达上限"""
+
+
+class PasswordHasher:
+    """在进程池中校验和生成密码哈希
+
+    workers 为 0 时在调用线程中直接计算（仍受 max_pending 限制）。
+    """
+
+    def __init__(self, method='pbkdf2:sha256', workers=2, max_pending=64, timeout=10.0):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        self.pending = 0
+        self.peak_pending = 0
+        self.rejected = 0
+        self.rehashed = 0
+
+    def _get_executor(self):
+        # fork 之后子进程需要自己的进程池
+        if self._executor is None or self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._executor_pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHasherBusy()
+        with self._lock:
+            self.pending += 1
+            self.peak_pending = max(self.peak_pending, self.pending)
+
+        if not self.workers:
+            try:
+                return func(*args)
+            finally:
+                self._release()
+
+        try:
+            future = self._get_executor().submit(func, *args)
+        except BaseException:
+            self._release()
+            raise
+        # 名额在任务真正结束（或被取消）时归还：等待超时后已开始计算的任务仍占用进程池
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise PasswordHasherBusy()
+
+    def _release(self, future=None):
+        with self._lock:
+            self.pending -= 1
+        self._slots.release()
+
+    def verify(self, password_hash, password):
+        """校验密码，排队已满或等待超时时抛出 PasswordHasherBusy"""
+        return self._run(check_password_hash, password_hash, password)
+
+    def hash(self, password):
+        """按当前配置生成哈希"""
+        return self._run(generate_password_hash, password, self.method)
+
+    def hash_many(self, passwords):
+        """批量生成哈希（初始化数据等离线场景，不受排队上限限制）"""
+        passwords = list(passwords)
+        if not self.workers or len(passwords) < 2:
+            return [generate_password_hash(password, method=self.method) for password in passwords]
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return list(self._get_executor().map(
+            generate_password_hash, passwords, [self.method] * len(passwords), chunksize=chunksize
+        ))
+
+    @cached_property
+    def method_prefix(self):
+        """当前配置生成的哈希前缀（补全默认参数，如 pbkdf2:sha256 -> pbkdf2:sha256:600000）"""
+        return generate_password_hash('', method=self.method).split('$', 1)[0]
+
+    def needs_rehash(self, password_hash):
+        """哈希不是按当前算法和强度生成的"""
+        return password_hash.split('$', 1)[0] != self.method_prefix
+
+    def rehash_if_needed(self, password_hash, password):
+        """密码校验通过后调用：哈希需要升级时返回按当前配置生成的新哈希，否则返回 None"""
+        if not self.needs_rehash(password_hash):
+            return None
+        new_hash = self.hash(password)
+        with self._lock:
+            self.rehashed += 1
+        return new_hash
+
+    def stats(self):
+        return {
+            'method': self.method_prefix,
+            'workers': self.workers,
+            'pending': self.pending,
+            'max_pending': self.max_pending,
+            'peak_pending': self.peak_pending,
+            'rejected': self.rejected,
+            'rehashed': self.rehashed
+        }
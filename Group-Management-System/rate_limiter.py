@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+速率限制模块
+基于滑动窗口的请求频率限制，后端可插拔：
+- memory: 进程内存（单进程部署，默认）
+- sqlite: 本地 SQLite(WAL) 共享文件，多个 worker 进程共享计数
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+
+class MemoryRateLimitBackend:
+    """进程内存后端：每个键保存窗口内的请求时间戳（滑动窗口日志）"""
+
+    def __init__(self, sweep_interval=60):
+        self._hits = {}
+        self._lock = threading.Lock()
+        self._sweep_interval = sweep_interval
+        self._last_sweep = time.monotonic()
+
+    def hit(self, key, window, limit, now=None):
+        """记录一次请求，返回是否允许通过"""
+        now = time.monotonic() if now is None else now
+        window_start = now - window
+
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits is None:
+                hits = self._hits[key] = deque()
+
+            # 淘汰窗口外的时间戳
+            while hits and hits[0] <= window_start:
+                hits.popleft()
+
+            allowed = len(hits) < limit
+            if allowed:
+                hits.append(now)
+
+            if now - self._last_sweep >= self._sweep_interval:
+                self._sweep(window_start)
+                self._last_sweep = now
+
+        return allowed
+
+    def _sweep(self, window_start):
+        """清理长时间没有请求的键，避免内存无限增长"""
+        idle_keys = [key for key, hits in self._hits.items() if not hits or hits[-1] <= window_start]
+        for key in idle_keys:
+            del self._hits[key]
+
+    def reset(self, key=None):
+        """清除计数（key 为空时清除全部）"""
+        with self._lock:
+            if key is None:
+                self._hits.clear()
+            else:
+                self._hits.pop(key, None)
+
+
+class SQLiteRateLimitBackend:
+    """SQLite(WAL) 后端：多个 worker 进程通过同一个本地文件共享计数
+
+    为了让每次检查只涉及两行数据，这里使用滑动窗口计数器：
+    按窗口长度分桶计数，用上一个桶按剩余比例加权估算滑动窗口内的请求数。
+    """
+
+    def __init__(self, path, timeout=5.0):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._path = path
+        self._timeout = timeout
+        self._local = threading.local()
+
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS rate_limit_bucket ('
+            ' key TEXT NOT NULL,'
+            ' bucket INTEGER NOT NULL,'
+            ' count INTEGER NOT NULL,'
+            ' PRIMARY KEY (key, bucket))'
+        )
+
+    def _connect(self):
+        """每个线程使用独立连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=self._timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key, window, limit, now=None):
+        """记录一次请求，返回是否允许通过"""
+        now = time.time() if now is None else now
+        bucket = int(now // window)
+        elapsed = (now % window) / window
+
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = dict(conn.execute(
+                'SELECT bucket, count FROM rate_limit_bucket WHERE key = ? AND bucket IN (?, ?)',
+                (key, bucket - 1, bucket)
+            ).fetchall())
+            estimated = rows.get(bucket - 1, 0) * (1 - elapsed) + rows.get(bucket, 0)
+
+            allowed = estimated < limit
+            if allowed:
+                conn.execute(
+                    'INSERT INTO rate_limit_bucket (key, bucket, count) VALUES (?, ?, 1) '
+                    'ON CONFLICT(key, bucket) DO UPDATE SET count = count + 1',
+                    (key, bucket)
+                )
+                # 新桶第一次写入时顺带清理该键的过期桶
+                if bucket not in rows:
+                    conn.execute(
+                        'DELETE FROM rate_limit_bucket WHERE key = ? AND bucket < ?',
+                        (key, bucket - 1)
+                    )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        return allowed
+
+    def reset(self, key=None):
+        """清除计数（key 为空时清除全部）"""
+        conn = self._connect()
+        if key is None:
+            conn.execute('DELETE FROM rate_limit_bucket')
+        else:
+            conn.execute('DELETE FROM rate_limit_bucket WHERE key = ?', (key,))
+
+
+class RateLimiter:
+    """滑动窗口速率限制器"""
+
+    def __init__(self, backend, window, limit):
+        self.backend = backend
+        self.window = window
+        self.limit = limit
+
+    def hit(self, key):
+        """记录一次请求，超出限制时返回 False"""
+        return self.backend.hit(key, self.window, self.limit)
+
+    def reset(self, key=None):
+        self.backend.reset(key)
+
+
+def create_rate_limiter(config):
+    """根据应用配置创建速率限制器"""
+    backend_name = config.get('RATE_LIMIT_BACKEND', 'memory')
+
+    if backend_name == 'memory':
+        backend = MemoryRateLimitBackend()
+    elif backend_name == 'sqlite':
+        backend = SQLiteRateLimitBackend(config['RATE_LIMIT_SQLITE_PATH'])
+    else:
+        raise ValueError(f'未知的速率限制后端: {backend_name}')
+
+    return RateLimiter(backend, config['RATE_LIMIT_WINDOW'], config['MAX_REQUESTS_PER_WINDOW'])
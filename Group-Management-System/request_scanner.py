@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+可疑请求扫描模块
+所有特征串编译成一个不区分大小写的正则，一次扫描即可找出任意特征；
+请求体按块增量扫描并设置上限，扫描过的部分重新接回输入流，
+视图函数照常读取请求体，大请求体不会被完整读入内存两次。
+"""
+
+import io
+import re
+from urllib.parse import unquote_plus
+
+DEFAULT_BINARY_CONTENT_TYPES = (
+    'image/', 'audio/', 'video/', 'font/',
+    'application/octet-stream', 'application/zip', 'application/gzip',
+    'application/pdf', 'application/x-7z-compressed', 'application/vnd.apache.parquet'
+)
+
+
+class PrefixedStream:
+    """先返回已读出的前缀，再继续读取原始输入流"""
+
+    def __init__(self, prefix, stream):
+        self._prefix = io.BytesIO(prefix)
+        self._stream = stream
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return self._prefix.read() + self._stream.read()
+        data = self._prefix.read(size)
+        if len(data) < size:
+            data += self._stream.read(size - len(data))
+        return data
+
+    def readline(self, size=-1):
+        line = self._prefix.readline(size)
+        if line.endswith(b'\n') or (size is not None and 0 <= size <= len(line)):
+            return line
+        remaining = -1 if size is None or size < 0 else size - len(line)
+        return line + self._stream.readline(remaining)
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            yield line
+
+
+class RequestScanner:
+    """可疑特征扫描器"""
+
+    def __init__(self, patterns, max_body_bytes=64 * 1024, chunk_size=8 * 1024,
+                 binary_content_types=DEFAULT_BINARY_CONTENT_TYPES):
+        patterns = [p.lower() for p in patterns if p]
+        if not patterns:
+            raise ValueError('至少需要一个特征串')
+        # 长的特征串放在前面，避免被其前缀抢先匹配
+        alternation = '|'.join(re.escape(p) for p in sorted(set(patterns), key=len, reverse=True))
+        self._regex = re.compile(alternation.encode('utf-8'), re.IGNORECASE)
+        self._overlap = max(len(p.encode('utf-8')) for p in patterns) - 1
+        self.max_body_bytes = max_body_bytes
+        self.chunk_size = chunk_size
+        self.binary_content_types = tuple(binary_content_types)
+
+    def scan_bytes(self, data):
+        """在一段数据中查找特征，返回命中的特征串或 None"""
+        match = self._regex.search(data)
+        return match.group(0).decode('utf-8', 'replace').lower() if match else None
+
+    def scan_text(self, text):
+        return self.scan_bytes(text.encode('utf-8', 'replace')) if text else None
+
+    def is_binary(self, content_type):
+        content_type = (content_type or '').lower()
+        return content_type.startswith(self.binary_content_types)
+
+    def scan_body(self, environ):
+        """增量扫描请求体前 max_body_bytes 字节，并把读出的数据接回 wsgi.input"""
+        try:
+            content_length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return None
+        if self.is_binary(environ.get('CONTENT_TYPE')):
+            return None
+        if content_length > 0:
+            to_read = min(content_length, self.max_body_bytes)
+        elif environ.get('wsgi.input_terminated'):
+            # 分块传输等长度未知的请求体，服务器保证输入流有结束，读到上限或结束为止
+            to_read = self.max_body_bytes
+        else:
+            return None
+
+        stream = environ['wsgi.input']
+        consumed = []
+        tail = b''
+        found = None
+
+        while to_read > 0:
+            chunk = stream.read(min(self.chunk_size, to_read))
+            if not chunk:
+                break
+            consumed.append(chunk)
+            to_read -= len(chunk)
+            # 带上上一块末尾的重叠部分，保证跨块的特征也能匹配
+            window = tail + chunk
+            found = self.scan_bytes(window)
+            if found:
+                break
+            tail = window[-self._overlap:] if self._overlap else b''
+
+        environ['wsgi.input'] = PrefixedStream(b''.join(consumed), stream)
+        return found
+
+    def scan(self, path, query_string, environ):
+        """依次扫描路径、查询字符串和请求体，返回命中的特征串或 None"""
+        return (
+            self.scan_text(path)
+            or self.scan_text(unquote_plus(query_string))
+            or self.scan_body(environ)
+        )
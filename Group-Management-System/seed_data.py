@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试数据生成
+生成用户、任务、操作日志和安全事件，规模可从默认的 25 个员工、约 500 个任务
+扩大到数千用户、数百万任务和日志，用于复现生产环境的数据量做性能测试。
+数据按块用 executemany 批量插入，每块一个事务；指定 --seed 时生成的数据完全相同（密码哈希的盐除外）。
+插入完成后重建任务日统计汇总和全文索引。
+
+用法:
+    python seed_data.py                          # 默认规模（已有员工数据时需加 --clear 或 --reset）
+    python seed_data.py --reset                  # 重建数据库结构后生成
+    python seed_data.py --reset --users 2000 --tasks 2000000 --logs 5000000 \\
+        --security-events 200000 --days 365 --seed 42
+"""
+
+import argparse
+import itertools
+import random
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+
+from sqlalchemy import func, inspect, select, text
+
+import task_search
+
+ADMIN_PASSWORD = 'admin123'
+EMPLOYEE_PASSWORD = '123456'
+
+TASK_TITLES = [
+    '完成项目报告', '客户会议', '代码审查', '系统测试', '文档编写',
+    '数据分析', '产品设计', '市场调研', '培训课程', '会议准备',
+    '问题排查', '性能优化', '安全检查', '备份维护', '用户支持',
+    '需求分析', '原型设计', '测试用例', '部署上线', '监控维护'
+]
+
+TASK_DESCRIPTIONS = [
+    '完成本周的项目进度报告，包括完成情况和下周计划',
+    '与客户进行项目进度沟通，了解需求和反馈',
+    '对团队成员的代码进行审查，确保代码质量',
+    '对系统进行全面测试，发现并修复问题',
+    '编写技术文档和用户手册',
+    '分析用户数据，生成分析报告',
+    '设计新产品功能，制定设计方案',
+    '进行市场调研，了解竞争对手情况',
+    '准备培训材料，进行员工培训',
+    '准备会议材料，安排会议议程',
+    '排查系统问题，找出根本原因',
+    '优化系统性能，提升用户体验',
+    '进行安全检查，确保系统安全',
+    '定期备份数据，确保数据安全',
+    '处理用户反馈，提供技术支持',
+    '分析用户需求，制定解决方案',
+    '设计产品原型，验证功能可行性',
+    '编写测试用例，确保功能正确性',
+    '部署新版本，确保系统稳定',
+    '监控系统运行状态，及时处理异常'
+]
+
+PRIORITIES = ['low', 'medium', 'high']
+
+# (操作类型, 权重)，接近实际使用中各操作的比例
+LOG_ACTIONS = [
+    ('用户登录', 20), ('查看任务列表', 40), ('创建任务', 15), ('更新任务', 10),
+    ('删除任务', 3), ('搜索任务', 5), ('用户登出', 5), ('导出数据', 1), ('登录失败', 1)
+]
+
+SECURITY_EVENT_TYPES = [
+    ('LOGIN_FAILED', 50), ('RATE_LIMIT_EXCEEDED', 25), ('SUSPICIOUS_ACTIVITY', 15),
+    ('BLOCKED_IP_REQUEST', 10)
+]
+
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Safari/605.1.15',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148',
+    'python-requests/2.31.0'
+]
+
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗'
+GIVEN_NAMES = '伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉兰'
+
+
+def _chunks(rows, size):
+    iterator = iter(rows)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def bulk_insert(engine, table, rows, chunk_size=10000, log=print):
+    """按块 executemany 插入，每块一个事务，返回插入行数"""
+    total = 0
+    started = time.monotonic()
+    for chunk in _chunks(rows, chunk_size):
+        with engine.begin() as conn:
+            conn.execute(table.insert(), chunk)
+        total += len(chunk)
+        if total % (chunk_size * 10) == 0:
+            log(f"    {table.name}: {total} 行")
+    elapsed = time.monotonic() - started
+    log(f"{table.name}: 插入 {total} 行，用时 {elapsed:.1f} 秒")
+    return total
+
+
+def _spread_times(rng, count, start, end):
+    """在 [start, end) 内生成 count 个递增的时间（按时间顺序插入，ID 与时间同序）"""
+    span = (end - start).total_seconds()
+    for i in range(count):
+        yield start + timedelta(seconds=(i + rng.random()) * span / count)
+
+
+def _random_ip(rng):
+    return f'10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}'
+
+
+def generate_users(rng, count, employee_hash, now):
+    width = max(2, len(str(count)))
+    for i in range(1, count + 1):
+        name = rng.choice(SURNAMES) + ''.join(rng.choice(GIVEN_NAMES) for _ in range(rng.randint(1, 2)))
+        yield {
+            'username': f'employee{i:0{width}d}',
+            'password_hash': employee_hash,
+            'role': 'employee',
+            'name': name,
+            'email': f'employee{i:0{width}d}@company.com',
+            'phone': f'138{i:08d}',
+            'created_at': now,
+            'is_active': True,
+            'login_attempts': 0
+        }
+
+
+def generate_tasks(rng, user_ids, count, days, today):
+    priority_weights = [3, 5, 2]
+    for _ in range(count):
+        task_date = today - timedelta(days=rng.randint(0, days - 1))
+        created_at = datetime.combine(task_date, dt_time(rng.randint(8, 19), rng.randint(0, 59), rng.randint(0, 59)))
+        yield {
+            'title': rng.choice(TASK_TITLES),
+            'description': rng.choice(TASK_DESCRIPTIONS),
+            'date': task_date,
+            'status': 'in_progress',
+            'priority': rng.choices(PRIORITIES, priority_weights)[0],
+            'user_id': rng.choice(user_ids),
+            'created_at': created_at,
+            'updated_at': created_at
+        }
+
+
+def generate_logs(rng, users, count, start, end):
+    actions, weights = zip(*LOG_ACTIONS)
+    user_ips = {}
+    for created_at in _spread_times(rng, count, start, end):
+        user_id, user_name = rng.choice(users)
+        if user_id not in user_ips:
+            user_ips[user_id] = _random_ip(rng)
+        action = rng.choices(actions, weights)[0]
+        yield {
+            'user_id': user_id,
+            'user_name': user_name,
+            'action': action,
+            'details': f'用户 {user_name} {action}',
+            'ip_address': user_ips[user_id],
+            'user_agent': rng.choice(USER_AGENTS),
+            'created_at': created_at
+        }
+
+
+def generate_security_events(rng, count, start, end):
+    event_types, weights = zip(*SECURITY_EVENT_TYPES)
+    # 少数IP产生大部分安全事件
+    hot_ips = [_random_ip(rng) for _ in range(50)]
+    for created_at in _spread_times(rng, count, start, end):
+        ip_address = rng.choice(hot_ips) if rng.random() < 0.8 else _random_ip(rng)
+        event_type = rng.choices(event_types, weights)[0]
+        yield {
+            'ip_address': ip_address,
+            'event_type': event_type,
+            'event_details': f'{event_type} from {ip_address}',
+            'user_agent': rng.choice(USER_AGENTS),
+            'created_at': created_at,
+            'is_blocked': False
+        }
+
+
+def bump_month_versions(conn, table, months):
+    """把指定月份的任务月份版本号加一（没有记录时插入版本1），使日历接口旧的 ETag 失效"""
+    for month in sorted(months):
+        result = conn.execute(table.update().where(table.c.month == month).values(version=table.c.version + 1))
+        if result.rowcount == 0:
+            conn.execute(table.insert().values(month=month, version=1))
+
+
+def seed_database(engine, metadata, hash_passwords, users=25, tasks=500, logs=0, security_events=0,
+                  days=30, seed=None, chunk_size=10000, log=print):
+    """生成一个管理员（admin）和指定数量的员工、任务、日志和安全事件
+
+    hash_passwords(passwords) 返回对应的密码哈希列表。员工共用一个密码哈希，
+    避免为数千个用户逐个计算慢哈希。返回各表插入的行数。
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    today = date.today()
+    days = max(1, days)
+    user_table = metadata.tables['user']
+
+    admin_hash, employee_hash = hash_passwords([ADMIN_PASSWORD, EMPLOYEE_PASSWORD])
+    counts = {}
+    with engine.begin() as conn:
+        if conn.execute(select(user_table.c.id).where(user_table.c.username == 'admin')).first() is None:
+            conn.execute(user_table.insert(), [{
+                'username': 'admin', 'password_hash': admin_hash, 'role': 'manager', 'name': '系统管理员',
+                'email': 'admin@company.com', 'phone': '13800000000', 'created_at': now,
+                'is_active': True, 'login_attempts': 0
+            }])
+    counts['user'] = bulk_insert(engine, user_table, generate_users(rng, users, employee_hash, now), chunk_size, log)
+
+    with engine.connect() as conn:
+        all_users = conn.execute(
+            select(user_table.c.id, user_table.c.name, user_table.c.role).order_by(user_table.c.id)
+        ).all()
+    employee_ids = [row.id for row in all_users if row.role == 'employee']
+    if tasks and employee_ids:
+        counts['task'] = bulk_insert(
+            engine, metadata.tables['task'], generate_tasks(rng, employee_ids, tasks, days, today), chunk_size, log
+        )
+        # 批量插入不经过接口，需要单独递增涉及月份的版本号
+        months = {(today - timedelta(days=offset)).strftime('%Y-%m') for offset in range(days)}
+        with engine.begin() as conn:
+            bump_month_versions(conn, metadata.tables['task_month_version'], months)
+
+    # 日志时间截止到今天零点，同一天内用相同种子生成的数据完全相同
+    end = datetime.combine(today, dt_time())
+    start = end - timedelta(days=days)
+    if logs:
+        log_users = [(row.id, row.name) for row in all_users]
+        counts['log'] = bulk_insert(
+            engine, metadata.tables['log'], generate_logs(rng, log_users, logs, start, end), chunk_size, log
+        )
+    if security_events:
+        counts['security_event'] = bulk_insert(
+            engine, metadata.tables['security_event'],
+            generate_security_events(rng, security_events, start, end), chunk_size, log
+        )
+    return counts
+
+
+def reset_schema(db, upgrade):
+    """删除全部表（包括全文索引和迁移记录）后重新建表并执行迁移
+
+    任务月份版本号保留下来并加一，版本号不会回到0，客户端缓存的日历 ETag 不会与新数据重合。
+    """
+    month_table = db.metadata.tables['task_month_version']
+    months = []
+    if inspect(db.engine).has_table(month_table.name):
+        with db.engine.connect() as conn:
+            months = [dict(row._mapping) for row in conn.execute(select(month_table))]
+    db.drop_all()
+    with db.engine.begin() as conn:
+        if task_search.index_exists(conn):
+            conn.execute(text(f'DROP TABLE {task_search.FTS_TABLE}'))
+        conn.execute(text('DROP TABLE IF EXISTS schema_migrations'))
+    db.create_all()
+    upgrade(db.engine, db.metadata, verbose=False)
+    if months:
+        with db.engine.begin() as conn:
+            conn.execute(month_table.insert(), [dict(row, version=row['version'] + 1) for row in months])
+
+
+# 清空测试数据时删除的表：任务及其汇总/变更/全文索引、操作日志、用户，以及属于这些用户的受信任设备
+# （任务月份版本号不删除，改为加一，见 clear_data）
+CLEAR_TABLES = {'task', 'task_daily_stat', 'task_change', 'log', 'trusted_device', 'user'}
+# 只有指定 include_security 时才清空的安全数据
+SECURITY_TABLES = {'security_event', 'blocked_ip', 'revoked_token'}
+
+
+def clear_data(engine, metadata, include_security=False, log=print):
+    """清空测试数据，保留表结构
+
+    IP黑名单、安全事件和已注销令牌默认保留（黑名单的操作人置空），include_security 时一并清空。
+    受信任设备绑定在被删除的用户上，总是随用户一起删除。
+    任务月份版本号保留并加一：各月任务已被清空，版本号回到0会让客户端缓存的日历 ETag 继续命中。
+    """
+    names = CLEAR_TABLES | SECURITY_TABLES if include_security else CLEAR_TABLES
+    with engine.begin() as conn:
+        month_table = metadata.tables['task_month_version']
+        conn.execute(month_table.update().values(version=month_table.c.version + 1))
+        if not include_security:
+            blocked_ip = metadata.tables['blocked_ip']
+            conn.execute(blocked_ip.update().values(blocked_by=None))
+        for table in reversed(metadata.sorted_tables):
+            if table.name not in names:
+                continue
+            count = conn.execute(table.delete()).rowcount
+            if table.name == 'trusted_device' and count:
+                log(f"已删除 {count} 个受信任设备（所属用户已清空）")
+        if task_search.index_exists(conn):
+            conn.execute(text(f'DELETE FROM {task_search.FTS_TABLE}'))
+
+
+def print_summary(engine, metadata):
+    with engine.connect() as conn:
+        for name in ('user', 'task', 'log', 'security_event'):
+            count = conn.execute(select(func.count()).select_from(metadata.tables[name])).scalar()
+            print(f"{name}: {count} 行")
+    print(f"管理员账户: admin / {ADMIN_PASSWORD}")
+    print(f"员工账户示例: employee01 / {EMPLOYEE_PASSWORD}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='测试数据生成')
+    parser.add_argument('--users', type=int, default=25, help='员工数（默认25）')
+    parser.add_argument('--tasks', type=int, default=500, help='任务总数（默认500）')
+    parser.add_argument('--logs', type=int, default=0, help='操作日志条数（默认0）')
+    parser.add_argument('--security-events', type=int, default=0, help='安全事件条数（默认0）')
+    parser.add_argument('--days', type=int, default=30, help='任务和日志分布在最近多少天内（默认30）')
+    parser.add_argument('--seed', type=int, help='随机数种子，指定后生成的数据可重复')
+    parser.add_argument('--chunk-size', type=int, default=10000, help='每个事务插入的行数（默认10000）')
+    parser.add_argument('--reset', action='store_true', help='删除并重建全部表后再生成')
+    parser.add_argument('--clear', action='store_true',
+                        help='清空已有的用户、任务和操作日志（保留表结构、IP黑名单和安全事件）后再生成')
+    parser.add_argument('--clear-security', action='store_true',
+                        help='与 --clear 一起使用：同时清空IP黑名单、安全事件和已注销令牌')
+    args = parser.parse_args()
+    if args.clear_security and not args.clear:
+        parser.error('--clear-security 需要与 --clear 一起使用')
+
+    from app import app, db, User, password_hasher, rebuild_task_daily_stats, rebuild_task_search_index
+    from migrations import upgrade
+
+    with app.app_context():
+        if args.reset:
+            reset_schema(db, upgrade)
+        else:
+            db.create_all()
+            upgrade(db.engine, db.metadata, verbose=False)
+            if args.clear:
+                clear_data(db.engine, db.metadata, include_security=args.clear_security)
+            elif db.session.query(User.id).filter(User.role == 'employee').first():
+                # 员工用户名按序号生成，追加会与已有用户冲突
+                print("数据库中已有员工数据，请使用 --clear 或 --reset")
+                return
+
+        seed_database(
+            db.engine, db.metadata, password_hasher.hash_many,
+            users=args.users, tasks=args.tasks, logs=args.logs, security_events=args.security_events,
+            days=args.days, seed=args.seed, chunk_size=args.chunk_size
+        )
+        print("重建任务日统计汇总和全文索引...")
+        rebuild_task_daily_stats()
+        rebuild_task_search_index()
+        print_summary(db.engine, db.metadata)
+
+
+if __name__ == '__main__':
+    main()
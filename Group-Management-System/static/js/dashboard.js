@@ -1,7 +1,19 @@
 // 全局变量
 let currentDate = new Date();
-let tasks = [];
+let tasks = [];  // 日历当前显示窗口内的任务
+const calendarCache = {};  // 月份 -> {etag, tasks}
+let calendarWindow = null;  // 日历当前显示窗口 {start, end}
+let taskVersion = null;  // 已加载数据对应的任务变更版本，用于增量同步
+let listTasks = [];  // 任务列表视图已加载的任务
+let listCursor = null;  // 任务列表下一页游标
+let listSearchPage = 0;  // 搜索结果已加载的页数（0 表示不在搜索模式）
+const TASK_LIST_PAGE_SIZE = 500;
+const TASK_SEARCH_PAGE_SIZE = 50;
+const USERS_PAGE_SIZE = 100;
+let usersCursor = null;  // 用户列表下一页游标
+let userSearchTimer = null;
 let editingTaskId = null;
+let taskSyncTimer = null;
 
 // 页面加载完成后初始化
 document.addEventListener('DOMContentLoaded', function() {
@@ -9,8 +21,60 @@ document.addEventListener('DOMContentLoaded', function() {
     loadTasks();
     renderCalendar();
     setupEventListeners();
+    connectEventStream();
 });
 
+// 订阅服务器推送（SSE）：任务变化时增量同步，领导另外收到安全事件提醒
+function connectEventStream() {
+    if (!window.EventSource) return;
+    const source = new EventSource('/api/events');
+    
+    // 断线重连后补齐期间错过的变化
+    source.addEventListener('open', () => {
+        if (taskVersion !== null) scheduleTaskSync();
+    });
+    source.addEventListener('task', event => {
+        const data = JSON.parse(event.data);
+        if (taskVersion === null || data.version > taskVersion) scheduleTaskSync();
+    });
+    source.addEventListener('reset', () => scheduleTaskSync());
+    source.addEventListener('security', event => showSecurityNotice(JSON.parse(event.data)));
+}
+
+// 短时间内的多个事件合并为一次同步
+function scheduleTaskSync() {
+    if (taskSyncTimer) return;
+    taskSyncTimer = setTimeout(() => {
+        taskSyncTimer = null;
+        syncTaskChanges();
+    }, 300);
+}
+
+function showSecurityNotice(event) {
+    let container = document.getElementById('security-notices');
+    if (!container) {
+        container = document.createElement('div');
+        container.id = 'security-notices';
+        document.body.appendChild(container);
+    }
+    
+    const notice = document.createElement('div');
+    notice.className = 'security-notice';
+    const title = document.createElement('strong');
+    title.textContent = `安全事件: ${event.event_type}`;
+    const details = document.createElement('span');
+    details.textContent = `${event.ip_address} ${event.event_details || ''}`;
+    notice.append(title, details);
+    notice.addEventListener('click', () => notice.remove());
+    container.appendChild(notice);
+    
+    // 最多保留5条提醒，8秒后自动消失
+    while (container.children.length > 5) {
+        container.firstChild.remove();
+    }
+    setTimeout(() => notice.remove(), 8000);
+}
+
 // 初始化导航
 function initializeNavigation() {
     const navItems = document.querySelectorAll('.nav-item');
@@ -50,7 +114,7 @@ function switchView(viewName) {
     if (viewName === 'calendar') {
         renderCalendar();
     } else if (viewName === 'tasks') {
-        renderTasksList();
+        loadTaskList();
     } else if (viewName === 'users') {
         loadUsers();
     }
@@ -64,6 +128,14 @@ function setupEventListeners() {
         saveTask();
     });
     
+    // 搜索框回车时搜索
+    document.getElementById('task-search')?.addEventListener('keydown', function(e) {
+        if (e.key === 'Enter') {
+            e.preventDefault();
+            filterTasks();
+        }
+    });
+    
     // 模态框关闭
     document.getElementById('task-modal').addEventListener('click', function(e) {
         if (e.target === this) {
@@ -72,18 +144,159 @@ function setupEventListeners() {
     });
 }
 
-// 加载任务数据
+// 加载任务数据（日历窗口，以及已打开的任务列表）
 async function loadTasks() {
+    await loadCalendarTasks();
+    if (document.getElementById('tasks-view')?.classList.contains('active')) {
+        await loadTaskList();
+    }
+}
+
+// 只加载日历当前显示的42天窗口内的任务
+async function loadCalendarTasks() {
+    const month = `${currentDate.getFullYear()}-${String(currentDate.getMonth() + 1).padStart(2, '0')}`;
+    const cached = calendarCache[month];
     try {
-        const response = await fetch('/api/tasks');
-        tasks = await response.json();
+        // 带上次的ETag做条件请求，该月没有变化时服务器返回304
+        const response = await fetch(`/api/calendar/${month}`, {
+            cache: 'no-store',
+            headers: cached ? { 'If-None-Match': cached.etag } : {}
+        });
+        if (response.status === 304 && cached) {
+            tasks = cached.tasks;
+            calendarWindow = cached.window;
+        } else {
+            const data = await response.json();
+            tasks = Object.values(data.days).flat();
+            calendarWindow = { start: data.start_date, end: data.end_date };
+            calendarCache[month] = { etag: response.headers.get('ETag'), tasks, window: calendarWindow };
+            if (taskVersion === null) taskVersion = data.version;
+        }
         renderCalendar();
+    } catch (error) {
+        console.error('加载任务失败:', error);
+    }
+}
+
+// 加载任务列表（服务端按日期筛选并分页；输入了关键词时改为全文搜索）
+async function loadTaskList(append = false) {
+    const startDateFilter = document.getElementById('start-date-filter')?.value;
+    const endDateFilter = document.getElementById('end-date-filter')?.value;
+    const keyword = document.getElementById('task-search')?.value.trim();
+    
+    if (keyword) {
+        await searchTaskList(keyword, startDateFilter, endDateFilter, append);
+        return;
+    }
+    listSearchPage = 0;
+    
+    const params = new URLSearchParams({ limit: TASK_LIST_PAGE_SIZE });
+    if (startDateFilter) params.append('start_date', startDateFilter);
+    if (endDateFilter) params.append('end_date', endDateFilter);
+    if (append && listCursor) params.append('cursor', listCursor);
+    
+    try {
+        const response = await fetch(`/api/tasks?${params.toString()}`);
+        const data = await response.json();
+        listTasks = append ? listTasks.concat(data.tasks) : data.tasks;
+        listCursor = data.next_cursor;
+        if (taskVersion === null) taskVersion = data.version;
         renderTasksList();
     } catch (error) {
         console.error('加载任务失败:', error);
     }
 }
 
+// 全文搜索任务（按相关度排序，分页加载）
+async function searchTaskList(keyword, startDateFilter, endDateFilter, append) {
+    const page = append ? listSearchPage + 1 : 1;
+    const params = new URLSearchParams({ q: keyword, page, limit: TASK_SEARCH_PAGE_SIZE });
+    if (startDateFilter) params.append('start_date', startDateFilter);
+    if (endDateFilter) params.append('end_date', endDateFilter);
+    
+    try {
+        const response = await fetch(`/api/tasks/search?${params.toString()}`);
+        const data = await response.json();
+        if (!response.ok) {
+            alert(data.error || '搜索失败');
+            return;
+        }
+        listTasks = append ? listTasks.concat(data.tasks) : data.tasks;
+        listSearchPage = page;
+        // 搜索模式下游标只用于显示“加载更多”按钮
+        listCursor = data.has_more ? `page-${page + 1}` : null;
+        renderTasksList();
+    } catch (error) {
+        console.error('搜索任务失败:', error);
+    }
+}
+
+// 增量同步：只拉取上次同步之后变化的任务，并修补本地的日历和列表数据
+async function syncTaskChanges() {
+    if (taskVersion === null) {
+        await loadTasks();
+        return;
+    }
+    try {
+        const response = await fetch(`/api/tasks/changes?since=${taskVersion}`, { cache: 'no-store' });
+        const data = await response.json();
+        if (data.reset) {
+            taskVersion = data.version;
+            await loadTasks();
+            return;
+        }
+        if (data.changes.length > 0) {
+            applyTaskChanges(data.changes);
+        }
+        taskVersion = data.version;
+    } catch (error) {
+        console.error('同步任务失败:', error);
+    }
+}
+
+function applyTaskChanges(changes) {
+    const changedIds = new Set(changes.map(change => change.task_id));
+    const upserts = changes.filter(change => change.action === 'upsert').map(change => change.task);
+    
+    // 日历：只保留落在当前显示窗口内的任务
+    tasks = tasks.filter(task => !changedIds.has(task.id));
+    if (calendarWindow) {
+        upserts.forEach(task => {
+            if (task.date >= calendarWindow.start && task.date <= calendarWindow.end) {
+                tasks.push(task);
+            }
+        });
+    }
+    renderCalendar();
+    
+    // 任务列表：按筛选条件和已加载的范围插入，保持日期和ID倒序
+    const startDateFilter = document.getElementById('start-date-filter')?.value;
+    const endDateFilter = document.getElementById('end-date-filter')?.value;
+    const lastLoaded = listCursor && listTasks.length > 0 ? listTasks[listTasks.length - 1] : null;
+    if (listSearchPage > 0) {
+        // 搜索结果只更新或移除已显示的任务，不插入新任务
+        const updated = new Map(upserts.map(task => [task.id, task]));
+        listTasks = listTasks
+            .filter(task => !changedIds.has(task.id) || updated.has(task.id))
+            .map(task => updated.get(task.id) || task);
+        if (document.getElementById('tasks-view')?.classList.contains('active')) {
+            renderTasksList();
+        }
+        return;
+    }
+    listTasks = listTasks.filter(task => !changedIds.has(task.id));
+    upserts.forEach(task => {
+        if (startDateFilter && task.date < startDateFilter) return;
+        if (endDateFilter && task.date > endDateFilter) return;
+        if (lastLoaded && task.date < lastLoaded.date) return;
+        listTasks.push(task);
+    });
+    listTasks.sort((a, b) => (a.date === b.date ? b.id - a.id : (a.date < b.date ? 1 : -1)));
+    if (document.getElementById('tasks-view')?.classList.contains('active')) {
+        renderTasksList();
+    }
+}
+
 // 渲染日历
 function renderCalendar() {
     const calendarDays = document.getElementById('calendar-days');
@@ -174,23 +387,11 @@ function renderCalendar() {
 // 渲染任务列表
 function renderTasksList() {
     const tasksList = document.getElementById('tasks-list');
-    const startDateFilter = document.getElementById('start-date-filter')?.value;
-    const endDateFilter = document.getElementById('end-date-filter')?.value;
     
     if (!tasksList) return;
     
-    let filteredTasks = tasks;
-    
-    // 按日期筛选
-    if (startDateFilter) {
-        filteredTasks = filteredTasks.filter(task => task.date >= startDateFilter);
-    }
-    if (endDateFilter) {
-        filteredTasks = filteredTasks.filter(task => task.date <= endDateFilter);
-    }
-    
-    // 按日期排序（最新的在前）
-    filteredTasks.sort((a, b) => new Date(b.date) - new Date(a.date));
+    // 服务端已按日期筛选并排序（最新的在前）
+    const filteredTasks = listTasks;
     
     // 按年、月、周、日进行层级分组
     const tasksByHierarchy = {};
@@ -497,12 +698,16 @@ function renderTasksList() {
         });
     }
     
+    if (listCursor) {
+        tasksHTML += '<div class="load-more"><button class="btn btn-outline" onclick="loadTaskList(true)">加载更多</button></div>';
+    }
+    
     tasksList.innerHTML = tasksHTML;
 }
 
 // 筛选任务
 function filterTasks() {
-    renderTasksList();
+    loadTaskList();
 }
 
 // 导出CSV
@@ -529,76 +734,82 @@ function exportCSV() {
     document.body.removeChild(link);
 }
 
-// 加载用户列表（仅领导可见）
+// 加载用户列表（仅领导可见，服务端搜索和分页）
 async function loadUsers() {
+    const usersList = document.getElementById('users-list');
+    if (!usersList) return;
+    
+    // 搜索框只创建一次，之后只刷新结果区域
+    if (!document.getElementById('user-search')) {
+        usersList.innerHTML = `
+            <div class="users-search-container">
+                <div class="search-box">
+                    <input type="text" id="user-search" placeholder="搜索员工..." oninput="filterUsers()">
+                    <span class="search-icon">🔍</span>
+                </div>
+                <div class="users-summary">
+                    <span>总员工数: <strong id="users-total">-</strong></span>
+                </div>
+            </div>
+            <div class="users-grid" id="users-grid"></div>
+            <div class="load-more" id="users-load-more" style="display: none">
+                <button class="btn btn-outline" onclick="loadUsersPage(true)">加载更多</button>
+            </div>
+        `;
+    }
+    await loadUsersPage(false);
+}
+
+async function loadUsersPage(append) {
+    const keyword = document.getElementById('user-search')?.value.trim() || '';
+    const params = new URLSearchParams({ limit: USERS_PAGE_SIZE, with_stats: 1 });
+    if (keyword) params.append('q', keyword);
+    if (append && usersCursor) params.append('cursor', usersCursor);
+    
     try {
-        const response = await fetch('/api/users');
-        const users = await response.json();
+        const response = await fetch(`/api/users?${params.toString()}`);
+        const data = await response.json();
         
-        const usersList = document.getElementById('users-list');
-        if (usersList) {
-            if (users.length === 0) {
-                usersList.innerHTML = '<div class="no-users">暂无员工账户</div>';
-                return;
-            }
-            
-            // 添加搜索功能
-            const searchHTML = `
-                <div class="users-search-container">
-                    <div class="search-box">
-                        <input type="text" id="user-search" placeholder="搜索员工..." onkeyup="filterUsers()">
-                        <span class="search-icon">🔍</span>
-                    </div>
-                    <div class="users-summary">
-                        <span>总员工数: <strong>${users.length}</strong></span>
+        // 输入变化后，丢弃较早发出的请求结果
+        if (keyword !== (document.getElementById('user-search')?.value.trim() || '')) return;
+        
+        usersCursor = data.next_cursor;
+        if (data.total !== null) {
+            document.getElementById('users-total').textContent = data.total;
+        }
+        
+        const usersHTML = data.users.map(user => `
+            <div class="user-card">
+                <div class="user-info">
+                    <div class="user-details">
+                        <h4>${user.name}</h4>
+                        <p>用户名: ${user.username}</p>
+                        <p>任务数: ${user.task_count}${user.last_task_date ? ` · 最近任务: ${formatDateForDisplay(user.last_task_date)}` : ''}</p>
                     </div>
-                </div>
-            `;
-            
-            const usersHTML = users.map(user => `
-                <div class="user-card" data-username="${user.username}" data-name="${user.name}">
-                    <div class="user-info">
-                        <div class="user-details">
-                            <h4>${user.name}</h4>
-                            <p>用户名: ${user.username}</p>
-                        </div>
-                        <div class="user-status">
-                            <span class="user-role">员工</span>
-                            <span class="read-only-badge">只读</span>
-                        </div>
+                    <div class="user-status">
+                        <span class="user-role">员工</span>
+                        <span class="read-only-badge">只读</span>
                     </div>
                 </div>
-            `).join('');
-            
-            usersList.innerHTML = searchHTML + '<div class="users-grid">' + usersHTML + '</div>';
+            </div>
+        `).join('');
+        
+        const grid = document.getElementById('users-grid');
+        if (append) {
+            grid.insertAdjacentHTML('beforeend', usersHTML);
+        } else {
+            grid.innerHTML = usersHTML || `<div class="no-users">${keyword ? '没有匹配的员工' : '暂无员工账户'}</div>`;
         }
+        document.getElementById('users-load-more').style.display = usersCursor ? 'block' : 'none';
     } catch (error) {
         console.error('加载用户失败:', error);
     }
 }
 
-// 过滤用户显示
+// 搜索用户（输入停顿后再请求服务端）
 function filterUsers() {
-    const searchTerm = document.getElementById('user-search').value.toLowerCase();
-    const userCards = document.querySelectorAll('.user-card');
-    
-    userCards.forEach(card => {
-        const username = card.getAttribute('data-username').toLowerCase();
-        const name = card.getAttribute('data-name').toLowerCase();
-        
-        if (username.includes(searchTerm) || name.includes(searchTerm)) {
-            card.style.display = 'block';
-        } else {
-            card.style.display = 'none';
-        }
-    });
-    
-    // 更新统计信息
-    const visibleCards = document.querySelectorAll('.user-card[style="display: block"], .user-card:not([style*="display: none"])');
-    const summaryElement = document.querySelector('.users-summary span');
-    if (summaryElement) {
-        summaryElement.innerHTML = `总员工数: <strong>${visibleCards.length}</strong>`;
-    }
+    clearTimeout(userSearchTimer);
+    userSearchTimer = setTimeout(() => loadUsersPage(false), 250);
 }
 
 // 打开任务模态框
@@ -641,7 +852,7 @@ function closeTaskModal() {
 
 // 编辑任务
 function editTask(taskId) {
-    const task = tasks.find(t => t.id === taskId);
+    const task = tasks.find(t => t.id === taskId) || listTasks.find(t => t.id === taskId);
     if (!task) return;
     
     editingTaskId = taskId;
@@ -713,7 +924,7 @@ async function saveTask() {
         
         if (response.ok) {
             closeTaskModal();
-            loadTasks();
+            syncTaskChanges();
         } else {
             const error = await response.json();
             alert('保存失败: ' + (error.error || '未知错误'));
@@ -852,7 +1063,7 @@ async function deleteTask(taskId) {
         });
         
         if (response.ok) {
-            loadTasks();
+            await syncTaskChanges();
             // 如果日程表模态框是打开的，刷新它
             const scheduleModal = document.getElementById('schedule-modal');
             if (scheduleModal.classList.contains('active')) {
@@ -872,12 +1083,12 @@ async function deleteTask(taskId) {
 // 日历导航
 function previousMonth() {
     currentDate.setMonth(currentDate.getMonth() - 1);
-    renderCalendar();
+    loadCalendarTasks();
 }
 
 function nextMonth() {
     currentDate.setMonth(currentDate.getMonth() + 1);
-    renderCalendar();
+    loadCalendarTasks();
 }
 
 // 工具函数
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+数据库存储配置
+数据库由 DATABASE_URL 指定，默认为 instance 目录下的 SQLite 文件，也可以是 PostgreSQL 等数据库服务器
+（postgresql://用户:密码@主机/库名，需安装驱动 psycopg）。
+
+数据库服务器使用按 DATABASE_POOL_SIZE 等配置的连接池，取出连接前先检测（pre-ping），
+数据库重启或空闲连接被断开后自动重连。
+
+SQLite 文件数据库在每个连接建立时开启 WAL 并设置 synchronous、cache_size、mmap_size、busy_timeout 等参数，
+并拆分为两个连接池：
+- 写连接池（默认 bind，db.engine）只有一个连接，所有写入在进程内排队，不再互相等待 SQLite 的写锁超时
+- 读连接池（bind 'read'）多个只读连接（query_only），WAL 模式下读取不会被正在进行的写入阻塞
+
+RoutingSession 把 db.session 中的查询发往读连接池；事务中一旦有写入（flush、INSERT/UPDATE/DELETE），
+之后的语句都在写连接上执行直到提交或回滚，保证同一事务内能读到自己未提交的修改。
+
+写连接只有一个：持有未提交写事务的线程如果再从 db.engine 取连接（如同步写审计日志），
+会一直等到 pool_timeout。这种情况先用 in_write_transaction(db.session) 判断，改为在当前事务中写入。
+"""
+
+import re
+
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.elements import TextClause
+
+READ_BIND = 'read'
+
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',  # WAL 模式下只在检查点时 fsync，断电最多丢失最近提交的事务，不会损坏数据库
+    'cache_size': -16000,  # 每个连接的页缓存（负数单位为 KiB）
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,  # 等待其他进程写锁的毫秒数
+    'temp_store': 'MEMORY'
+}
+
+_READ_STATEMENT = re.compile(r'\s*(SELECT|WITH)\b', re.IGNORECASE)
+_WRITING = 'routing_writing'
+
+
+def normalize_database_url(uri):
+    """兼容部分平台提供的 postgres:// 写法"""
+    if uri.startswith('postgres://'):
+        return 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def backend_name(uri):
+    """数据库类型：sqlite、postgresql 等"""
+    return make_url(uri).get_backend_name()
+
+
+def is_sqlite_file(uri):
+    """是否为 SQLite 文件数据库（内存数据库每个连接互相独立，不能拆分连接池）"""
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def configure_engines(config):
+    """根据 SQLALCHEMY_DATABASE_URI 补充连接池配置，SQLite 文件数据库时注册只读 bind
+
+    需在创建 SQLAlchemy 扩展之前调用，返回是否启用了读写拆分。
+    """
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    options = config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    timeout = config.get('DATABASE_POOL_TIMEOUT', 30)
+
+    if backend_name(uri) != 'sqlite':
+        # 每个 worker 进程一个连接池，部署时需保证 worker 数 × (pool_size + max_overflow) 不超过数据库的最大连接数
+        options.setdefault('pool_size', config.get('DATABASE_POOL_SIZE', 10))
+        options.setdefault('max_overflow', config.get('DATABASE_MAX_OVERFLOW', 10))
+        options.setdefault('pool_timeout', timeout)
+        options.setdefault('pool_recycle', config.get('DATABASE_POOL_RECYCLE', 1800))
+        options.setdefault('pool_pre_ping', True)
+        return False
+
+    if not is_sqlite_file(uri) or not config.get('DATABASE_READ_SPLIT', True):
+        return False
+
+    # 单写连接：SQLite 同一时间只允许一个写事务，多个写连接只会互相等待写锁
+    options.setdefault('pool_size', 1)
+    options.setdefault('max_overflow', 0)
+    options.setdefault('pool_timeout', timeout)
+
+    binds = config.setdefault('SQLALCHEMY_BINDS', {})
+    binds[READ_BIND] = {
+        'url': uri,
+        'pool_size': config.get('DATABASE_READ_POOL_SIZE', 8),
+        'max_overflow': config.get('DATABASE_READ_MAX_OVERFLOW', 8),
+        'pool_timeout': timeout
+    }
+    return True
+
+
+def install_sqlite_pragmas(engine, pragmas, query_only=False):
+    """连接建立时执行 PRAGMA；query_only 的连接拒绝任何写入"""
+    statements = [f'PRAGMA {name}={value}' for name, value in pragmas.items()]
+    if query_only:
+        statements.append('PRAGMA query_only=ON')
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+
+def setup_engines(db, app):
+    """给已创建的引擎安装连接参数（需在应用上下文中调用）"""
+    if backend_name(app.config['SQLALCHEMY_DATABASE_URI']) != 'sqlite':
+        return
+    pragmas = {**DEFAULT_SQLITE_PRAGMAS, **app.config.get('SQLITE_PRAGMAS', {})}
+    install_sqlite_pragmas(db.engines[None], pragmas)
+    if READ_BIND in db.engines:
+        install_sqlite_pragmas(db.engines[READ_BIND], pragmas, query_only=True)
+
+
+def _is_read(clause):
+    if clause is None:
+        return True
+    if getattr(clause, 'is_dml', False):
+        return False
+    if isinstance(clause, TextClause):
+        return _READ_STATEMENT.match(clause.text) is not None
+    return True
+
+
+class RoutingSession(Session):
+    """读语句走只读连接池、写入及写入之后的语句走写连接的 Session"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or self.info.get(_WRITING) or not _is_read(clause):
+                self.info[_WRITING] = True
+            else:
+                read_engine = self._db.engines.get(READ_BIND)
+                if read_engine is not None:
+                    return read_engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def in_write_transaction(session):
+    """Session 的当前事务中是否已有写入（占用着写连接，提交或回滚前不会归还）"""
+    return bool(session.info.get(_WRITING)) and session.in_transaction()
+
+
+@event.listens_for(RoutingSession, 'after_transaction_end')
+def _reset_routing(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(_WRITING, None)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务全文搜索
+使用 SQLite FTS5 虚拟表 task_fts（rowid 即任务ID）索引任务标题和描述。
+FTS5 自带的 unicode61 分词器会把连续的中文当作一个词，无法搜索其中的片段，
+因此写入前先在 Python 中分词：中文（及日文、韩文）按相邻两字切成二元词组，
+其余文字保持原样交给 unicode61 按空格和标点切分。查询时使用同样的规则。
+"""
+
+import re
+
+from sqlalchemy import text
+
+FTS_TABLE = 'task_fts'
+
+# 标题的权重高于描述（bm25 分数越小越相关）
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+_CJK_RUN = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+')
+_WORD = re.compile(r'[^\W_]+')
+
+
+def _bigrams(run):
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def tokenize(value):
+    """把文本转换成写入索引的形式：中文片段替换为以空格分隔的二元词组"""
+    if not value:
+        return ''
+    return _CJK_RUN.sub(lambda m: ' ' + ' '.join(_bigrams(m.group(0))) + ' ', value)
+
+
+def build_match_query(query):
+    """把用户输入转换成 FTS5 MATCH 表达式（各词之间为 AND），没有可搜索的词时返回 None
+
+    中文按二元词组精确匹配，单个汉字和其他文字的词按前缀匹配。
+    """
+    terms = []
+    position = 0
+    for match in _CJK_RUN.finditer(query):
+        terms.extend(f'"{word.lower()}"*' for word in _WORD.findall(query[position:match.start()]))
+        run = match.group(0)
+        terms.extend(f'"{run}"*' if len(run) == 1 else f'"{gram}"' for gram in _bigrams(run))
+        position = match.end()
+    terms.extend(f'"{word.lower()}"*' for word in _WORD.findall(query[position:]))
+
+    if not terms:
+        return None
+    return ' AND '.join(dict.fromkeys(terms))
+
+
+def fts_supported(conn):
+    """数据库是否为 SQLite 且编译了 FTS5"""
+    if conn.dialect.name != 'sqlite':
+        return False
+    options = conn.execute(text('PRAGMA compile_options')).scalars().all()
+    return 'ENABLE_FTS5' in options
+
+
+def index_exists(conn):
+    if conn.dialect.name != 'sqlite':
+        return False
+    return conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': FTS_TABLE}
+    ).first() is not None
+
+
+def create_index(conn):
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+        f"USING fts5(title, description, tokenize = 'unicode61 remove_diacritics 2')"
+    ))
+
+
+def index_task(conn, task_id, title, description):
+    """写入或更新一个任务的索引（conn 可以是数据库连接或 Session）"""
+    conn.execute(text(f'DELETE FROM {FTS_TABLE} WHERE rowid = :id'), {'id': task_id})
+    conn.execute(
+        text(f'INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (:id, :title, :description)'),
+        {'id': task_id, 'title': tokenize(title), 'description': tokenize(description)}
+    )
+
+
+def remove_task(conn, task_id):
+    conn.execute(text(f'DELETE FROM {FTS_TABLE} WHERE rowid = :id'), {'id': task_id})
+
+
+def rebuild_index(conn, task_table, batch_size=5000):
+    """根据任务表重建全部索引"""
+    conn.execute(text(f'DELETE FROM {FTS_TABLE}'))
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            task_table.select()
+            .with_only_columns(task_table.c.id, task_table.c.title, task_table.c.description)
+            .where(task_table.c.id > last_id)
+            .order_by(task_table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        conn.execute(
+            text(f'INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (:id, :title, :description)'),
+            [{'id': row.id, 'title': tokenize(row.title), 'description': tokenize(row.description)} for row in rows]
+        )
+        last_id = rows[-1].id
+
+
+def search_statement(match, user_id=None, start_date=None, end_date=None, limit=20, offset=0):
+    """构造按相关度排序的搜索语句，可按用户和日期范围（YYYY-MM-DD）筛选"""
+    conditions = [f'{FTS_TABLE} MATCH :match']
+    params = {'match': match, 'limit': limit, 'offset': offset}
+    if user_id is not None:
+        conditions.append('task.user_id = :user_id')
+        params['user_id'] = user_id
+    if start_date:
+        conditions.append('task.date >= :start_date')
+        params['start_date'] = start_date
+    if end_date:
+        conditions.append('task.date <= :end_date')
+        params['end_date'] = end_date
+
+    sql = (
+        f'SELECT task.id FROM {FTS_TABLE} JOIN task ON task.id = {FTS_TABLE}.rowid '
+        f'WHERE {" AND ".join(conditions)} '
+        f'ORDER BY bm25({FTS_TABLE}, {TITLE_WEIGHT}, {DESCRIPTION_WEIGHT}), task.date DESC, task.id DESC '
+        f'LIMIT :limit OFFSET :offset'
+    )
+    return text(sql).bindparams(**params)
+
+
+def search_task_ids(conn, match, **filters):
+    """按相关度返回匹配任务的ID列表，筛选参数同 search_statement"""
+    return conn.execute(search_statement(match, **filters)).scalars().all()
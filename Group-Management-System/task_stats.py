@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务日统计汇总
+task_daily_stat 表按 (用户, 日期) 保存各优先级的任务数，
+任务增删改时在同一事务中增量更新，统计接口只读汇总表。
+"""
+
+from sqlalchemy import case, delete, func, insert, select, update
+
+# 优先级 -> 汇总表中的计数列
+PRIORITY_COLUMNS = {
+    'high': 'high_count',
+    'medium': 'medium_count',
+    'low': 'low_count'
+}
+
+
+def adjust_daily_stat(conn, stat_table, user_id, day, priority, delta):
+    """给某个用户某一天的计数加上 delta（可为负数）
+
+    conn 可以是数据库连接或 Session，更新与任务修改在同一事务中提交。
+    """
+    column = PRIORITY_COLUMNS.get(priority)
+    values = {'total_count': stat_table.c.total_count + delta}
+    if column:
+        values[column] = stat_table.c[column] + delta
+
+    key = (stat_table.c.user_id == user_id) & (stat_table.c.date == day)
+    result = conn.execute(update(stat_table).where(key).values(**values))
+
+    if result.rowcount == 0 and delta > 0:
+        row = {'user_id': user_id, 'date': day, 'total_count': delta}
+        for name in PRIORITY_COLUMNS.values():
+            row[name] = 0
+        if column:
+            row[column] = delta
+        conn.execute(insert(stat_table).values(**row))
+    elif delta < 0:
+        # 当天已没有任务时删除该行
+        conn.execute(delete(stat_table).where(key & (stat_table.c.total_count <= 0)))
+
+
+def rebuild_daily_stats(conn, task_table, stat_table):
+    """根据任务表重建全部汇总数据"""
+    conn.execute(delete(stat_table))
+
+    counts = [
+        func.sum(case((task_table.c.priority == priority, 1), else_=0))
+        for priority in PRIORITY_COLUMNS
+    ]
+    source = select(
+        task_table.c.user_id,
+        task_table.c.date,
+        *counts,
+        func.count()
+    ).group_by(task_table.c.user_id, task_table.c.date)
+
+    conn.execute(insert(stat_table).from_select(
+        ['user_id', 'date', *PRIORITY_COLUMNS.values(), 'total_count'],
+        source
+    ))
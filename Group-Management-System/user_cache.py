@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+登录用户缓存模块
+login_manager.user_loader 每个请求都会调用，这里在进程内按用户ID缓存一个
+只包含常用字段的轻量身份对象，缓存有效期内的请求不再查询数据库。
+密码哈希、登录尝试次数等安全字段不放入缓存对象。
+"""
+
+import threading
+import time
+
+
+class CachedUser:
+    """当前登录用户的轻量身份对象（兼容 Flask-Login 的用户接口）"""
+
+    __slots__ = ('id', 'username', 'name', 'role', 'email', 'phone', 'is_active', 'created_at', 'last_login')
+
+    # 与数据库查询时的列顺序一致
+    FIELDS = __slots__
+
+    def __init__(self, id, username, name, role, email, phone, is_active, created_at, last_login):
+        self.id = id
+        self.username = username
+        self.name = name
+        self.role = role
+        self.email = email
+        self.phone = phone
+        self.is_active = is_active if is_active is not None else True
+        self.created_at = created_at
+        self.last_login = last_login
+
+    @property
+    def is_authenticated(self):
+        return True
+
+    @property
+    def is_anonymous(self):
+        return False
+
+    def get_id(self):
+        return str(self.id)
+
+    def __repr__(self):
+        return f'<CachedUser {self.id} {self.username}>'
+
+
+class UserCache:
+    """带有效期的用户身份缓存
+
+    loader(user_id) 返回 CachedUser 或 None，不存在的用户不缓存。
+    """
+
+    def __init__(self, loader, ttl=60, max_size=10000):
+        self._loader = loader
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        now = time.monotonic()
+        entry = self._entries.get(user_id)
+        if entry and entry[0] > now:
+            return entry[1]
+
+        user = self._loader(user_id)
+        if user is not None:
+            with self._lock:
+                if len(self._entries) >= self.max_size:
+                    self._entries = {key: value for key, value in self._entries.items() if value[0] > now}
+                    if len(self._entries) >= self.max_size:
+                        self._entries.clear()
+                self._entries[user_id] = (now + self.ttl, user)
+        return user
+
+    def invalidate(self, user_id=None):
+        """清除某个用户（user_id 为空时清除全部）的缓存"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)